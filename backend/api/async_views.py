@@ -0,0 +1,187 @@
+"""
+Асинхронный путь для горячих эндпоинтов при запуске под ASGI: список
+тегов, автодополнение ингредиентов, переход по короткой ссылке
+и закэшированные для анонимов страницы рецептов.
+Пока медленный клиент отправляет запрос и читает ответ, поток не занят.
+Обращения к базе и кэшу выполняются в пуле потоков ограниченного
+размера. Всё, что быстрый путь не обслуживает (запись, авторизованные
+страницы рецептов, промах кэша, браузерный интерфейс DRF), передаётся
+обычным представлениям.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+from api.autocomplete import ingredient_index
+from api.cache import get_cache_namespaces, response_cache_key
+from api.renderers import JSONRenderer
+from api.serializers import TagSerializer
+from api.views import RecipeViewSet, redirect_to_recipe
+from recipes.models import Tag
+
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='async-db'
+)
+
+
+def call_in_pool(func, *args):
+    """Соединения потока пула живут по тем же правилам, что в запросе."""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args):
+    """Контекст передаётся в поток: SQL попадает в замер запроса."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, context.run, call_in_pool, func, *args
+    )
+
+
+def wants_json(request):
+    """Запрос, на который DRF ответил бы JSONRenderer."""
+    return (
+        request.method in ('GET', 'HEAD')
+        and 'format' not in request.GET
+        and 'text/html' not in request.headers.get('Accept', '')
+    )
+
+
+def authenticates(request):
+    """
+    Переданный токен действителен. С недействительным токеном отвечает
+    DRF, чтобы ответ остался 401, как без быстрого пути.
+    """
+    try:
+        CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return True
+
+
+def json_response(data):
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type='application/json'
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def get_tags(request):
+    if authenticates(request):
+        return TagSerializer(Tag.objects.all(), many=True).data
+    return None
+
+
+def get_ingredients(request):
+    if not authenticates(request):
+        return None
+    name = request.GET.get('name')
+    if name:
+        return ingredient_index.search(name)
+    return ingredient_index.all()
+
+
+def get_cached_recipes(request, action, lookup=None):
+    """Ответ из кэша анонимов, как в `AnonymousCacheMixin`, или None."""
+    if 'HTTP_AUTHORIZATION' in request.META:
+        return None
+    namespaces = get_cache_namespaces(action, lookup)
+    if namespaces is None:
+        return None
+    return cache.get(response_cache_key(
+        request, namespaces, RecipeViewSet.cache_query_params
+    ))
+
+
+async def respond(func, *args):
+    data = await run_in_pool(func, *args)
+    return None if data is None else json_response(data)
+
+
+async def tags_list(request):
+    if wants_json(request):
+        return await respond(get_tags, request)
+    return None
+
+
+async def ingredients_list(request):
+    if wants_json(request):
+        return await respond(get_ingredients, request)
+    return None
+
+
+async def recipes_list(request):
+    if wants_json(request):
+        return await respond(get_cached_recipes, request, 'list')
+    return None
+
+
+async def recipes_detail(request, pk):
+    if wants_json(request):
+        return await respond(get_cached_recipes, request, 'retrieve', pk)
+    return None
+
+
+async def short_link(request, code):
+    return await run_in_pool(redirect_to_recipe, request, code)
+
+
+FAST_PATHS = {
+    'tags-list': tags_list,
+    'ingredients-list': ingredients_list,
+    'recipes-list': recipes_list,
+    'recipes-detail': recipes_detail,
+    'short-link': short_link,
+    'redirect-to-recipe': short_link,
+}
+
+
+def fast_view(handler, view):
+    """
+    Асинхронное представление: сначала быстрый путь, при отказе
+    (`None`) — исходное синхронное представление, как его вызвал бы
+    Django под ASGI.
+    """
+    fallback = sync_to_async(view)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if 'format' not in kwargs:
+            response = await handler(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await fallback(request, *args, **kwargs)
+
+    return async_view
+
+
+def with_fast_paths(patterns):
+    """Заменить представления горячих маршрутов асинхронными."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            fast_view(FAST_PATHS[pattern.name], pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in FAST_PATHS
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,95 @@
+"""
+Аутентификация по токену с кэшем: поля токена и пользователя хранятся
+в общем кэше `AUTH_TOKEN_CACHE_TIMEOUT` секунд и удаляются из него при
+удалении токена (в том числе при выходе) и при сохранении пользователя:
+смене пароля, блокировке, изменении профиля или аватара. Хэш пароля
+в кэш не попадает.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.db.models.fields.files import FieldFile
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.metrics import counters
+
+
+User = get_user_model()
+
+TOKEN_PREFIX = 'auth:credentials:'
+TOKEN_FIELDS = ('key', 'user_id', 'created')
+# Поля, которые не кэшируются: у восстановленного пользователя они
+# отложены и при обращении читаются из базы.
+USER_EXCLUDED_FIELDS = {'password'}
+AUTH_CACHE_HITS = 'auth_token_cache_hits'
+AUTH_CACHE_MISSES = 'auth_token_cache_misses'
+
+
+def token_cache_key(key):
+    """В ключе кэша хэш токена, а не сам токен."""
+    return TOKEN_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(keys):
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def dump_credentials(token):
+    """Значения полей токена и пользователя без исключённых полей."""
+    user = {}
+    for field in User._meta.concrete_fields:
+        if field.attname in USER_EXCLUDED_FIELDS:
+            continue
+        value = getattr(token.user, field.attname)
+        if isinstance(value, FieldFile):
+            value = value.name
+        user[field.attname] = value
+    return {
+        'token': [getattr(token, name) for name in TOKEN_FIELDS],
+        'user': user,
+    }
+
+
+def load_credentials(credentials):
+    """Токен и пользователь, как будто загруженные из базы."""
+    user = User.from_db(
+        router.db_for_read(User),
+        list(credentials['user']),
+        list(credentials['user'].values()),
+    )
+    token = Token.from_db(
+        router.db_for_read(Token), TOKEN_FIELDS, credentials['token']
+    )
+    token.user = user
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    `TokenAuthentication`, который берёт токен и пользователя из кэша.
+    Неизвестные токены не кэшируются: токен, выданный при входе,
+    действует сразу.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            counters.increment(AUTH_CACHE_MISSES)
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, dump_credentials(token),
+                settings.AUTH_TOKEN_CACHE_TIMEOUT,
+            )
+            return user, token
+        counters.increment(AUTH_CACHE_HITS)
+        token = load_credentials(credentials)
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
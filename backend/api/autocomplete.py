@@ -0,0 +1,81 @@
+"""
+Индекс ингредиентов в памяти процесса для автодополнения.
+Индекс строится при первом обращении и перестраивается, когда меняется
+версия пространства `ingredients` в общем кэше.
+"""
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+
+from api.cache import get_versions
+from recipes.models import Ingredient
+
+
+INGREDIENTS = 'ingredients'
+
+
+class IngredientIndex:
+    """
+    Отсортированный список названий ингредиентов в нижнем регистре.
+    Ключи и строки хранятся одной парой `index` и подменяются одним
+    присваиванием, чтобы поиск в другом потоке не смешал старый
+    и новый индекс.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.index = ([], [])
+
+    def load(self):
+        version, = get_versions((INGREDIENTS,))
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            rows = sorted(
+                (
+                    name.casefold(),
+                    {'id': id, 'name': name, 'measurement_unit': unit},
+                )
+                for id, name, unit in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            self.index = (
+                [key for key, _ in rows], [row for _, row in rows]
+            )
+            self.version = version
+
+    def all(self):
+        self.load()
+        return self.index[1]
+
+    def search(self, query, limit=None):
+        """
+        Найти ингредиенты по началу или вхождению названия.
+        Сначала точное совпадение, затем совпадения по началу названия,
+        затем по вхождению, внутри групп — по алфавиту.
+        Вхождения ищутся полным проходом по справочнику: на ~2 000
+        названий это доли миллисекунды, отдельный индекс не нужен.
+        """
+        self.load()
+        keys, rows = self.index
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        found = rows[start:min(end, start + limit)]
+        if len(found) < limit:
+            found += [
+                row for key, row in zip(keys, rows)
+                if query in key and not key.startswith(query)
+            ][:limit - len(found)]
+        return found
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,224 @@
+"""
+Вспомогательные функции для замеров производительности API.
+Наполнение базы реалистичным набором данных и сбор статистики по запросам.
+"""
+import base64
+import csv
+import io
+import random
+import time
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import COUNTERS, recount
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+)
+from recipes.search import index_recipes
+from users.models import Subscription
+
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+BENCH_IMAGE = 'recipes/benchmark.png'
+BENCH_PASSWORD = 'benchmark-password'
+
+
+@dataclass
+class Dataset:
+    """Объекты набора данных, с которыми работают замеры."""
+
+    actor: User
+    token: str
+    authors: list
+    own_recipes: list
+    recipes: list
+    ingredients: list
+    tags: list
+
+
+@dataclass
+class Measurement:
+    """Результаты замеров одного эндпоинта."""
+
+    name: str
+    timings: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    sizes: list = field(default_factory=list)
+    statuses: set = field(default_factory=set)
+
+    @staticmethod
+    def percentile(values, percent):
+        ordered = sorted(values)
+        index = max(0, round(percent / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def as_dict(self):
+        return {
+            'queries': max(self.queries),
+            'p50_ms': round(self.percentile(self.timings, 50), 2),
+            'p95_ms': round(self.percentile(self.timings, 95), 2),
+            'size': max(self.sizes),
+        }
+
+
+def measure(measurement, call):
+    """Выполнить запрос, записав время, число SQL-запросов и размер ответа."""
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = call()
+        content = (
+            b''.join(response.streaming_content) if response.streaming
+            else response.content
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+    measurement.timings.append(elapsed)
+    measurement.queries.append(len(context))
+    measurement.sizes.append(len(content))
+    measurement.statuses.add(response.status_code)
+    return response
+
+
+def make_image():
+    """Картинка рецепта в base64, как её присылает фронтенд."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def bulk_create(model, objects):
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def load_ingredients(path):
+    if not Ingredient.objects.exists():
+        with open(path, 'r', encoding='utf-8') as file:
+            bulk_create(Ingredient, [
+                Ingredient(name=name.strip(), measurement_unit=unit.strip())
+                for name, unit in csv.reader(file) if name
+            ])
+    return list(Ingredient.objects.values_list('id', flat=True))
+
+
+def load_tags(path):
+    if not Tag.objects.exists():
+        with open(path, 'r', encoding='utf-8') as file:
+            bulk_create(Tag, [
+                Tag(name=name, slug=slug)
+                for name, slug in csv.reader(file) if name
+            ])
+    return list(Tag.objects.all())
+
+
+def seed_dataset(
+    users, recipes, favorites, subscriptions, seed=0,
+    ingredients_path='data/ingredients.csv', tags_path='data/tags.csv',
+):
+    """
+    Наполнить пустую базу набором данных заданного размера.
+    Пользователь `actor` получает подписки, избранное и список покупок,
+    от его имени выполняются запросы авторизованного клиента.
+    """
+    rnd = random.Random(seed)
+    ingredient_ids = load_ingredients(ingredients_path)
+    tags = load_tags(tags_path)
+
+    actor = User.objects.create_user(
+        username='benchmark', email='benchmark@foodgram.local',
+        password=BENCH_PASSWORD, first_name='Bench', last_name='Mark',
+    )
+    bulk_create(User, [
+        User(
+            username=f'user{index}', email=f'user{index}@foodgram.local',
+            first_name=f'Имя{index}', last_name=f'Фамилия{index}',
+            password='!',
+        )
+        for index in range(users)
+    ])
+    user_ids = list(
+        User.objects.exclude(id=actor.id).values_list('id', flat=True)
+    )
+
+    bulk_create(Recipe, [
+        Recipe(
+            name=f'Рецепт {index}', text='Описание рецепта. ' * 20,
+            cooking_time=rnd.randint(1, 240), image=BENCH_IMAGE,
+            author_id=actor.id if index < 100 else rnd.choice(user_ids),
+        )
+        for index in range(recipes)
+    ])
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    own_recipes = list(
+        Recipe.objects.filter(author=actor).values_list('id', flat=True)
+    )
+
+    through = Recipe.tags.through
+    bulk_create(through, [
+        through(recipe_id=recipe_id, tag_id=tag.id)
+        for recipe_id in recipe_ids
+        for tag in rnd.sample(tags, rnd.randint(1, min(3, len(tags))))
+    ])
+    bulk_create(RecipeIngredient, [
+        RecipeIngredient(
+            recipe_id=recipe_id, ingredient_id=ingredient_id,
+            amount=rnd.randint(1, 500),
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rnd.sample(ingredient_ids, rnd.randint(3, 12))
+    ])
+
+    pairs = set()
+    while len(pairs) < favorites:
+        pairs.add((rnd.choice(user_ids), rnd.choice(recipe_ids)))
+    bulk_create(Favorite, [
+        Favorite(user_id=user_id, recipe_id=recipe_id)
+        for user_id, recipe_id in pairs
+    ])
+
+    pairs = set()
+    while len(pairs) < subscriptions:
+        user_id, author_id = rnd.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    bulk_create(Subscription, [
+        Subscription(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ])
+
+    authors = rnd.sample(user_ids, min(200, len(user_ids)))
+    bulk_create(Subscription, [
+        Subscription(user_id=actor.id, author_id=author_id)
+        for author_id in authors[:100]
+    ])
+    sample = rnd.sample(recipe_ids, min(400, len(recipe_ids)))
+    bulk_create(Favorite, [
+        Favorite(user_id=actor.id, recipe_id=recipe_id)
+        for recipe_id in sample[:50]
+    ])
+    bulk_create(ShoppingList, [
+        ShoppingList(user_id=actor.id, recipe_id=recipe_id)
+        for recipe_id in sample[50:80]
+    ])
+    for counter in COUNTERS:
+        recount(*counter)
+    index_recipes(recipe_ids)
+    return Dataset(
+        actor=actor,
+        token=Token.objects.create(user=actor).key,
+        authors=authors[100:],
+        own_recipes=own_recipes,
+        recipes=sample[80:],
+        ingredients=ingredient_ids,
+        tags=tags,
+    )
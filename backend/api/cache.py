@@ -0,0 +1,113 @@
+"""
+Кэш ответов API для анонимных пользователей.
+Ключи строятся из версий пространств имён: запись в базу меняет версию
+пространства, и все ключи со старой версией становятся недостижимыми.
+"""
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.response import Response
+
+
+VERSION_PREFIX = 'api:version:'
+CATALOG = 'catalog'
+RECIPES = 'recipes'
+
+
+def recipe_namespace(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def get_versions(namespaces):
+    """Получить текущие версии пространств, создав отсутствующие."""
+    keys = [VERSION_PREFIX + namespace for namespace in namespaces]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    for key, version in missing.items():
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+        versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def bump(*namespaces):
+    """Сменить версии пространств имён, сделав их ключи устаревшими."""
+    cache.set_many(
+        {VERSION_PREFIX + namespace: uuid4().hex for namespace in namespaces},
+        None,
+    )
+
+
+def is_process_local():
+    """
+    Кэш в памяти процесса: версии, сменённые командой manage.py,
+    не дойдут до работающего сервера.
+    """
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def get_cache_namespaces(action, lookup=None):
+    """Пространства ответа `list` или `retrieve` рецепта с id `lookup`."""
+    if action != 'retrieve':
+        return (CATALOG, RECIPES)
+    try:
+        return (CATALOG, recipe_namespace(int(lookup)))
+    except ValueError:
+        return None
+
+
+def response_cache_key(request, namespaces, query_params):
+    """
+    Ключ ответа: версии пространств, адрес запроса и нормализованные
+    параметры из `query_params` (порядок параметров и значений не важен).
+    """
+    params = sorted(
+        (name, sorted(request.GET.getlist(name)))
+        for name in query_params if name in request.GET
+    )
+    source = f'{request.build_absolute_uri(request.path)}?{params}'
+    return 'api:response:{}:{}'.format(
+        ':'.join(get_versions(namespaces)),
+        hashlib.md5(source.encode()).hexdigest(),
+    )
+
+
+class AnonymousCacheMixin:
+    """
+    Кэширование ответов `list` и `retrieve` для анонимных пользователей.
+    Ответ одинаков для всех анонимов при одинаковых параметрах запроса.
+    """
+
+    cache_query_params = ()
+
+    def get_cache_namespaces(self):
+        return get_cache_namespaces(
+            self.action,
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        namespaces = self.get_cache_namespaces()
+        if not request.user.is_anonymous or namespaces is None:
+            return view(request, *args, **kwargs)
+        key = response_cache_key(
+            request, namespaces, self.cache_query_params
+        )
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,131 @@
+"""
+Разбор планов SQL-запросов эндпоинтов API.
+Отмечаются последовательные чтения больших таблиц, сортировки без индекса
+и соединения, которые нужны запросу только для ORDER BY.
+"""
+import json
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$')
+ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+JOIN = re.compile(
+    r'JOIN "(\w+)"(?: (\w+))? ON \((.*?)\)'
+    r'(?= INNER| LEFT| WHERE| GROUP| ORDER| LIMIT|$)'
+)
+
+
+@dataclass(frozen=True)
+class Issue:
+    """Замечание к плану запроса."""
+
+    kind: str
+    detail: str
+
+    def __str__(self):
+        return f'{self.kind}: {self.detail}'
+
+
+class PlanAuditor:
+    """
+    Проверка планов запросов на текущей базе. Таблицы меньше `min_rows`
+    строк читать целиком и сортировать в памяти дешевле индекса,
+    такие чтения и сортировки не отмечаются.
+    """
+
+    def __init__(self, min_rows=1000):
+        self.min_rows = min_rows
+        self.sizes = {}
+        self.tables = set(connection.introspection.table_names())
+
+    def table_rows(self, table):
+        if table not in self.tables:
+            return 0
+        if table not in self.sizes:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                self.sizes[table], = cursor.fetchone()
+        return self.sizes[table]
+
+    def audit(self, sql):
+        """Замечания к запросу: по плану и по тексту SQL."""
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return []
+        if connection.vendor == 'postgresql':
+            issues = self.audit_postgres(sql)
+        else:
+            issues = self.audit_sqlite(sql)
+        return issues + self.audit_joins(sql)
+
+    def audit_postgres(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        issues = []
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', ()))
+            kind = node['Node Type']
+            if kind == 'Seq Scan' and (
+                self.table_rows(node['Relation Name']) >= self.min_rows
+            ):
+                issues.append(Issue('seq scan', node['Relation Name']))
+            elif kind == 'Sort' and node['Plan Rows'] >= self.min_rows:
+                issues.append(Issue('sort', ', '.join(node['Sort Key'])))
+        return issues
+
+    def audit_sqlite(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[3] for row in cursor.fetchall()]
+        aliases = dict(
+            (alias, table) for table, alias in ALIAS.findall(sql)
+        )
+        issues, scanned = [], set()
+        for detail in details:
+            scan = SQLITE_SCAN.match(detail)
+            if not scan:
+                continue
+            table, _, rest = scan.groups()
+            table = aliases.get(table, table)
+            if self.table_rows(table) < self.min_rows:
+                continue
+            scanned.add(table)
+            if 'INDEX' not in rest:
+                issues.append(Issue('seq scan', table))
+        # Оценок числа строк в плане SQLite нет: сортировка считается
+        # дорогой, если перед ней читается большая таблица, а не
+        # выбираются строки по индексу (SEARCH).
+        if scanned:
+            issues += [
+                Issue('sort', f'{", ".join(sorted(scanned))}: {detail}')
+                for detail in details if detail.startswith('USE TEMP B-TREE')
+            ]
+        return issues
+
+    @staticmethod
+    def audit_joins(sql):
+        """
+        Соединения, таблица которых упоминается только в ORDER BY:
+        обычно это сортировка модели по внешнему ключу, подтянувшая
+        `Meta.ordering` связанной модели.
+        """
+        order_by = sql.rfind(' ORDER BY ')
+        if order_by < 0:
+            return []
+        issues = []
+        for match in JOIN.finditer(sql):
+            table, alias, _ = match.groups()
+            reference = f'"{alias or table}".'
+            rest = sql[:match.start()] + sql[match.end():order_by]
+            if reference not in rest and reference in sql[order_by:]:
+                issues.append(Issue('join for ordering', table))
+        return issues
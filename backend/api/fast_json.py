@@ -0,0 +1,89 @@
+"""
+JSON через orjson, если он установлен и выбран в `JSON_BACKEND`.
+Результат совпадает со стандартным `json` в настройках DRF
+по умолчанию (`UNICODE_JSON`, `COMPACT_JSON`): те же разделители,
+экранирование и представление дат, `Decimal` и прочих типов через
+`default` кодировщика DRF. Когда orjson не справляется (целые шире
+64 бит, глубокая вложенность, невалидный UTF-8), вызывающий код
+переходит на стандартный `json`.
+
+Отличия orjson только в числах с плавающей точкой, в ответах API их
+нет; все они проверяются в `benchmark_json`:
+- |x| >= 1e16: экспонента без знака плюс, `1e20` вместо `1e+20`;
+- |x| < 1e-4: экспонента без ведущего нуля (`1.5e-7` вместо `1.5e-07`)
+  или десятичная дробь (`0.00001` вместо `1e-05`), двузначные
+  экспоненты (`2.5e-10`) совпадают;
+- то же для float из `default` (`Decimal` без `COERCE_DECIMAL_TO_STRING`)
+  и для float ключей словарей;
+- NaN и бесконечности пишутся как `null`, стандартный json бросает
+  ValueError.
+Проверять данные на float перед рендером дороже самого рендера orjson.
+"""
+from django.conf import settings
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    # Даты и датаклассы отдаются в `default`, как в стандартном json.
+    OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+# Целые за пределами 64 бит orjson читает как float.
+WIDE_NUMBER = 2 ** 63
+
+
+def is_enabled():
+    return orjson is not None and settings.JSON_BACKEND == 'orjson'
+
+
+def dumps(data, default):
+    """
+    Байты как у `JSONRenderer` DRF без отступов
+    или None, если данные нужно отдать стандартному json.
+    """
+    try:
+        content = orjson.dumps(data, default=default, option=OPTIONS)
+    except orjson.JSONEncodeError:
+        return None
+    # DRF экранирует разделители строк, которые ломают JavaScript.
+    return content.replace(LINE_SEPARATOR, b'\\u2028').replace(
+        PARAGRAPH_SEPARATOR, b'\\u2029'
+    )
+
+
+def has_wide_numbers(data):
+    """Есть ли в разобранных orjson данных float за пределами 64 бит."""
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        kind = type(item)
+        if kind is float:
+            if abs(item) >= WIDE_NUMBER:
+                return True
+        elif kind is dict:
+            stack.extend(item.values())
+        elif kind is list:
+            stack.extend(item)
+    return False
+
+
+def loads(content):
+    """
+    Разобрать байты UTF-8. ValueError — тело нужно разобрать
+    стандартным json: ошибка разбора или очень большие числа.
+    """
+    data = orjson.loads(content)
+    if has_wide_numbers(data):
+        raise ValueError('Числа шире 64 бит.')
+    return data
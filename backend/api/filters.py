@@ -1,12 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import (
-    AllValuesMultipleFilter,
     BooleanFilter,
     CharFilter,
+    ChoiceFilter,
     FilterSet,
+    MultipleChoiceFilter,
     NumberFilter,
 )
 
-from recipes.models import Ingredient, Recipe
+from api.cache import CATALOG, get_versions
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+
+
+TAGS_ANY = 'any'
+TAGS_ALL = 'all'
+
+
+def get_tag_ids():
+    """Id тегов по слагам из кэша под текущей версией каталога."""
+    version, = get_versions((CATALOG,))
+    key = f'tags:ids:{version}'
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, settings.RESPONSE_CACHE_TIMEOUT)
+    return tag_ids
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class IngredientSearchFilter(FilterSet):
@@ -26,17 +51,32 @@ class IngredientSearchFilter(FilterSet):
 class RecipeFilter(FilterSet):
     """
     Кастомный фильтр для рецептов.
-    Доступна фильтрация по избранному, автору, списку покупок и тегам.
+    Доступна фильтрация по избранному, автору, списку покупок и тегам
+    и полнотекстовый поиск с сортировкой по релевантности.
+    Теги проверяются подзапросами `Exists` к связующей таблице, поэтому
+    рецепты не дублируются и `DISTINCT` не нужен. По умолчанию рецепт
+    подходит, если у него есть любой из тегов, при `tags_match=all` —
+    если есть все.
     """
 
     is_favorited = BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
-    tags = AllValuesMultipleFilter(field_name='tags__slug')
+    tags = MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_tags'
+    )
+    tags_match = ChoiceFilter(
+        choices=((TAGS_ANY, TAGS_ANY), (TAGS_ALL, TAGS_ALL)),
+        method='filter_tags_match',
+    )
     author = NumberFilter(field_name='author__id')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'tags', 'author']
+        fields = [
+            'is_favorited', 'is_in_shopping_cart', 'tags', 'tags_match',
+            'author', 'search',
+        ]
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -53,3 +93,20 @@ class RecipeFilter(FilterSet):
         if value:
             return queryset.filter(shoppinglists__user=user)
         return queryset.exclude(shoppinglists__user=user)
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        ids = [tag_ids[slug] for slug in value if slug in tag_ids]
+        tagged = Recipe.tags.through.objects.filter(recipe_id=OuterRef('pk'))
+        if self.form.cleaned_data.get('tags_match') != TAGS_ALL:
+            return queryset.filter(Exists(tagged.filter(tag_id__in=ids)))
+        for tag_id in ids:
+            queryset = queryset.filter(Exists(tagged.filter(tag_id=tag_id)))
+        return queryset
+
+    def filter_tags_match(self, queryset, name, value):
+        """Режим учитывается в `filter_tags`."""
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,345 @@
+"""
+Нагрузочный прогон: виртуальные пользователи параллельно проходят
+основные сценарии клиента против запущенного бэкенда. Используется
+только стандартная библиотека, внешние сервисы не нужны.
+"""
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import quote, urlsplit
+
+from api.benchmark import Measurement, make_image
+
+
+PASSWORD = 'Load-test-password-42'
+
+JOURNEYS = (
+    'publish', 'browse', 'autocomplete', 'favorite', 'cart', 'short-links',
+)
+
+
+class StepStats:
+    """Задержки, статусы и ошибки шагов сценариев со всех потоков."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def add(self, step, elapsed, status, ok):
+        with self.lock:
+            self.timings[step].append(elapsed)
+            self.statuses[step][str(status)] += 1
+            if not ok:
+                self.errors[step] += 1
+
+    def summary(self, step, duration):
+        timings = self.timings[step]
+        return {
+            'requests': len(timings),
+            'errors': self.errors[step],
+            'error_rate': round(self.errors[step] / len(timings), 4),
+            'rps': round(len(timings) / duration, 2),
+            'p50_ms': round(Measurement.percentile(timings, 50), 2),
+            'p95_ms': round(Measurement.percentile(timings, 95), 2),
+            'p99_ms': round(Measurement.percentile(timings, 99), 2),
+            'statuses': dict(sorted(self.statuses[step].items())),
+        }
+
+    def report(self, duration):
+        steps = {
+            step: self.summary(step, duration)
+            for step in sorted(self.timings)
+        }
+        requests = sum(step['requests'] for step in steps.values())
+        errors = sum(step['errors'] for step in steps.values())
+        return {
+            'duration_s': round(duration, 2),
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0,
+            'rps': round(requests / duration, 2),
+            'steps': steps,
+        }
+
+
+class NoDelayMixin:
+    """
+    Запрос уходит без задержки Нагла, а ответ подтверждается сразу.
+    Сервер, который пишет заголовки и тело ответа отдельно (runserver,
+    wsgiref), иначе ждёт подтверждения заголовков, а клиент откладывает
+    его на ~40 мс: задержка на каждом запросе через keep-alive.
+    """
+
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def quick_ack(self):
+        # TCP_QUICKACK есть только в Linux и сбрасывается ядром,
+        # поэтому включается перед каждым ответом.
+        if self.sock is not None and hasattr(socket, 'TCP_QUICKACK'):
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+
+class NoDelayHTTPConnection(NoDelayMixin, HTTPConnection):
+    pass
+
+
+class NoDelayHTTPSConnection(NoDelayMixin, HTTPSConnection):
+    pass
+
+
+class Session:
+    """Соединение одного виртуального пользователя с keep-alive."""
+
+    def __init__(self, url, stats, timeout):
+        parts = urlsplit(url)
+        self.connection_class = (
+            NoDelayHTTPSConnection if parts.scheme == 'https'
+            else NoDelayHTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.stats = stats
+        self.timeout = timeout
+        self.token = None
+        self.connection = None
+
+    def request(self, step, method, path, data=None, expected=200):
+        """
+        Выполнить запрос шага и записать задержку. Ответ с другим
+        статусом и сетевая ошибка считаются ошибками шага.
+        Возвращает статус и тело ответа (None при сетевой ошибке).
+        """
+        headers = {'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        if self.connection is None:
+            self.connection = self.connection_class(
+                self.netloc, timeout=self.timeout
+            )
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body, headers)
+            self.connection.quick_ack()
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+        except (OSError, HTTPException):
+            self.connection.close()
+            self.connection = None
+            content, status = None, 'error'
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats.add(step, elapsed, status, status == expected)
+        return status, content
+
+    def json(self, step, method, path, data=None, expected=200):
+        status, content = self.request(step, method, path, data, expected)
+        if status != expected or not content:
+            return None
+        return json.loads(content)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+class VirtualUser:
+    """
+    Пользователь, который регистрируется, получает токен и в каждой
+    итерации проходит выбранные сценарии.
+    """
+
+    def __init__(self, number, run, catalog, session, journeys, seed):
+        self.number = number
+        self.run = run
+        self.catalog = catalog
+        self.session = session
+        self.journeys = journeys
+        self.random = random.Random(seed + number)
+        self.recipes = []
+
+    def sign_up(self):
+        email = f'load-{self.run}-{self.number}@foodgram.local'
+        self.session.json('signup', 'POST', '/api/users/', {
+            'email': email,
+            'username': f'load-{self.run}-{self.number}',
+            'first_name': 'Нагрузка',
+            'last_name': f'Пользователь {self.number}',
+            'password': PASSWORD,
+        }, expected=201)
+        data = self.session.json('token', 'POST', '/api/auth/token/login/', {
+            'email': email, 'password': PASSWORD,
+        })
+        if data:
+            self.session.token = data['auth_token']
+        return self.session.token is not None
+
+    def publish(self):
+        ingredients = self.catalog['ingredients']
+        ingredients = self.random.sample(ingredients, min(5, len(ingredients)))
+        self.session.json('recipe-create', 'POST', '/api/recipes/', {
+            'name': f'Рецепт нагрузки {self.run}-{self.number}',
+            'text': 'Описание рецепта. ' * 10,
+            'cooking_time': self.random.randint(5, 120),
+            'image': self.catalog['image'],
+            'tags': [self.random.choice(self.catalog['tags'])['id']],
+            'ingredients': [
+                {'id': ingredient['id'], 'amount': self.random.randint(1, 500)}
+                for ingredient in ingredients
+            ],
+        }, expected=201)
+
+    def browse(self):
+        """Первая страница рецептов по тегам, затем одна из следующих."""
+        tags = '&'.join(
+            f'tags={tag["slug"]}' for tag in self.random.sample(
+                self.catalog['tags'], min(2, len(self.catalog['tags']))
+            )
+        )
+        data = self.session.json(
+            'recipes-list', 'GET', f'/api/recipes/?{tags}&limit=6'
+        )
+        if data and data['next']:
+            pages = min(3, (data['count'] + 5) // 6)
+            page = self.session.json(
+                'recipes-list-page', 'GET',
+                f'/api/recipes/?{tags}&limit=6'
+                f'&page={self.random.randint(2, pages)}'
+            )
+            data = page or data
+        if data and data['results']:
+            self.recipes = [recipe['id'] for recipe in data['results']]
+            self.session.json(
+                'recipes-detail', 'GET',
+                f'/api/recipes/{self.random.choice(self.recipes)}/'
+            )
+
+    def autocomplete(self):
+        """Набор названия ингредиента по буквам."""
+        name = self.random.choice(self.catalog['ingredients'])['name']
+        for length in range(1, min(4, len(name)) + 1):
+            self.session.request(
+                'ingredients-search', 'GET',
+                f'/api/ingredients/?name={quote(name[:length])}'
+            )
+
+    def favorite(self):
+        if not self.recipes:
+            return
+        path = f'/api/recipes/{self.random.choice(self.recipes)}/favorite/'
+        self.session.request('favorite', 'POST', path, expected=201)
+        self.session.request('favorite-delete', 'DELETE', path, expected=204)
+
+    def cart(self):
+        """Заполнить список покупок, скачать PDF и очистить список."""
+        if not self.recipes:
+            return
+        paths = [
+            f'/api/recipes/{recipe_id}/shopping_cart/'
+            for recipe_id in self.random.sample(
+                self.recipes, min(3, len(self.recipes))
+            )
+        ]
+        for path in paths:
+            self.session.request('cart-add', 'POST', path, expected=201)
+        self.session.request(
+            'cart-pdf', 'GET', '/api/recipes/download_shopping_cart/'
+        )
+        for path in paths:
+            self.session.request('cart-delete', 'DELETE', path, expected=204)
+
+    def short_links(self):
+        if not self.recipes:
+            return
+        data = self.session.json(
+            'get-link', 'GET',
+            f'/api/recipes/{self.random.choice(self.recipes)}/get-link/'
+        )
+        if data:
+            self.session.request(
+                'short-link', 'GET', urlsplit(data['short-link']).path,
+                expected=302,
+            )
+
+    def iterate(self):
+        for journey in self.journeys:
+            getattr(self, journey.replace('-', '_'))()
+
+
+def load_catalog(url, timeout):
+    """Теги и ингредиенты, из которых пользователи собирают запросы."""
+    stats = StepStats()
+    session = Session(url, stats, timeout)
+    try:
+        catalog = {
+            'tags': session.json('catalog', 'GET', '/api/tags/'),
+            'ingredients': session.json('catalog', 'GET', '/api/ingredients/'),
+        }
+    finally:
+        session.close()
+    if stats.statuses['catalog']['error']:
+        raise ValueError(f'{url}: бэкенд недоступен.')
+    if not catalog['tags'] or not catalog['ingredients']:
+        raise ValueError(
+            f'{url}: нет тегов или ингредиентов, загрузите их командами '
+            'add_tags и add_ingr.'
+        )
+    catalog['image'] = make_image()
+    return catalog
+
+
+def run_load(
+    url, concurrency, iterations=None, duration=None, journeys=JOURNEYS,
+    think_time=0, timeout=30, seed=0,
+):
+    """
+    Прогнать `concurrency` виртуальных пользователей по `iterations`
+    итераций или до истечения `duration` секунд и вернуть отчёт.
+    """
+    catalog = load_catalog(url, timeout)
+    stats = StepStats()
+    run = f'{int(time.time())}-{seed}'
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def work(number):
+        session = Session(url, stats, timeout)
+        user = VirtualUser(number, run, catalog, session, journeys, seed)
+        try:
+            if not user.sign_up():
+                return
+            iteration = 0
+            while (iterations is None or iteration < iterations) and (
+                deadline is None or time.perf_counter() < deadline
+            ):
+                user.iterate()
+                iteration += 1
+                if think_time:
+                    time.sleep(user.random.uniform(0, think_time * 2))
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(work, range(concurrency)))
+    report = stats.report(time.perf_counter() - started)
+    report['config'] = {
+        'url': url,
+        'concurrency': concurrency,
+        'iterations': iterations,
+        'duration': duration,
+        'journeys': list(journeys),
+        'think_time': think_time,
+        'seed': seed,
+    }
+    return report
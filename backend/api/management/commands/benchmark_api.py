@@ -0,0 +1,295 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.benchmark import Measurement, make_image, measure, seed_dataset
+from api.short_links import click_buffer
+from shortlinks.models import ShortLink
+
+
+DEFAULT_BUDGET = 'data/api_budget.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер числа SQL-запросов, задержки и размера ответов эндпоинтов API '
+        'на отдельной тестовой базе с проверкой числа запросов и размера '
+        'по сохранённому бюджету. Задержка проверяется по желанию '
+        'относительно прошлого замера на той же машине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=30000)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--budget', default=DEFAULT_BUDGET)
+        parser.add_argument(
+            '--update-budget', action='store_true',
+            help='Записать результаты замеров как новый бюджет.'
+        )
+        parser.add_argument(
+            '--size-tolerance', type=float, default=1.1,
+            help='Допустимое превышение размера ответа относительно бюджета.'
+        )
+        parser.add_argument(
+            '--latency-baseline',
+            help=(
+                'Отчёт (--report) прошлого замера на этой же машине с тем же '
+                '--iterations: проверить p95 относительно него.'
+            ),
+        )
+        parser.add_argument(
+            '--latency-tolerance', type=float, default=1.5,
+            help='Допустимое превышение p95 относительно прошлого замера.'
+        )
+        parser.add_argument(
+            '--report', help='Сохранить результаты замеров в JSON файл.'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    results = self.run_benchmark(options)
+        finally:
+            # Переходы по ссылкам тестовой базы не должны попасть в рабочую.
+            click_buffer.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_results(results)
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if options['update_budget']:
+            budget = {
+                name: {
+                    'queries': result['queries'], 'size': result['size'],
+                }
+                for name, result in results.items()
+            }
+            with open(options['budget'], 'w', encoding='utf-8') as file:
+                json.dump(budget, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+            self.stdout.write(
+                self.style.SUCCESS(f'Бюджет записан в {options["budget"]}.')
+            )
+            return
+        errors = self.check_budget(results, options)
+        if options['latency_baseline']:
+            errors += self.check_latency(results, options)
+        if errors:
+            raise CommandError('Превышен бюджет:\n' + '\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Бюджет соблюдён.'))
+
+    def run_benchmark(self, options):
+        self.stdout.write('Наполнение тестовой базы...')
+        dataset = seed_dataset(
+            options['users'], options['recipes'], options['favorites'],
+            options['subscriptions'], seed=options['seed'],
+        )
+        iterations = options['iterations']
+        recipes = dataset.recipes
+        for recipe_id in recipes[:iterations]:
+            ShortLink.objects.create(
+                original_url=f'http://testserver/recipes/{recipe_id}/'
+            )
+        codes = list(ShortLink.objects.values_list('short_code', flat=True))
+
+        anonymous = APIClient()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+        image = make_image()
+        tags = [tag.id for tag in dataset.tags]
+        slugs = [tag.slug for tag in dataset.tags]
+
+        def recipe_data(index):
+            return {
+                'name': f'Новый рецепт {index}',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': image,
+                'tags': tags[:2],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': 5}
+                    for ingredient_id in dataset.ingredients[:10]
+                ],
+            }
+
+        favorites = recipes[:iterations]
+        carts = recipes[iterations:iterations * 2]
+        authors = dataset.authors[:iterations]
+        page = f'?page={iterations}&limit=6'
+        search = [f'?name={"молоко"[:length]}' for length in range(1, 7)]
+        by_tags = '?' + '&'.join(f'tags={slug}' for slug in slugs[:2])
+        endpoints = (
+            ('recipes-list', anonymous, 'get', 200,
+             lambda i: reverse('recipes-list'), None),
+            ('recipes-list-deep-page', anonymous, 'get', 200,
+             lambda i: reverse('recipes-list') + page, None),
+            ('recipes-list-cursor', anonymous, 'get', 200,
+             lambda i: reverse('recipes-list') + '?cursor=&limit=6', None),
+            ('recipes-list-tags', anonymous, 'get', 200,
+             lambda i: reverse('recipes-list') + by_tags, None),
+            ('recipes-list-search', anonymous, 'get', 200,
+             lambda i: reverse('recipes-list') + f'?search=Рецепт {i}', None),
+            ('recipes-list-auth', client, 'get', 200,
+             lambda i: reverse('recipes-list'), None),
+            ('recipes-list-favorited', client, 'get', 200,
+             lambda i: reverse('recipes-list') + '?is_favorited=1', None),
+            ('recipes-detail', anonymous, 'get', 200,
+             lambda i: reverse('recipes-detail', args=(recipes[i],)), None),
+            ('recipes-detail-auth', client, 'get', 200,
+             lambda i: reverse('recipes-detail', args=(recipes[i],)), None),
+            ('recipes-create', client, 'post', 201,
+             lambda i: reverse('recipes-list'), recipe_data),
+            ('recipes-update', client, 'patch', 200,
+             lambda i: reverse(
+                 'recipes-detail', args=(dataset.own_recipes[i],)
+             ), recipe_data),
+            ('recipes-favorite', client, 'post', 201,
+             lambda i: reverse('recipes-favorite', args=(favorites[i],)),
+             None),
+            ('recipes-favorite-delete', client, 'delete', 204,
+             lambda i: reverse('recipes-favorite', args=(favorites[i],)),
+             None),
+            ('recipes-shopping-cart', client, 'post', 201,
+             lambda i: reverse('recipes-shopping-cart', args=(carts[i],)),
+             None),
+            ('recipes-shopping-cart-delete', client, 'delete', 204,
+             lambda i: reverse('recipes-shopping-cart', args=(carts[i],)),
+             None),
+            ('recipes-download-shopping-cart', client, 'get', 200,
+             lambda i: reverse('recipes-download-shopping-cart'), None),
+            ('recipes-download-shopping-cart-json', client, 'get', 200,
+             lambda i: reverse('recipes-download-shopping-cart')
+             + '?format=json', None),
+            ('recipes-get-link', anonymous, 'get', 200,
+             lambda i: reverse('recipes-get-link', args=(recipes[i],)),
+             None),
+            ('users-list', anonymous, 'get', 200,
+             lambda i: reverse('users-list'), None),
+            ('users-subscriptions', client, 'get', 200,
+             lambda i: reverse('users-subscriptions') + '?recipes_limit=3',
+             None),
+            ('users-subscribe', client, 'post', 201,
+             lambda i: reverse('users-subscribe', args=(authors[i],)), None),
+            ('users-subscribe-delete', client, 'delete', 204,
+             lambda i: reverse('users-subscribe', args=(authors[i],)), None),
+            ('users-me', client, 'get', 200,
+             lambda i: reverse('users-me'), None),
+            ('tags-list', anonymous, 'get', 200,
+             lambda i: reverse('tags-list'), None),
+            ('ingredients-list', anonymous, 'get', 200,
+             lambda i: reverse('ingredients-list'), None),
+            ('ingredients-search', anonymous, 'get', 200,
+             lambda i: reverse('ingredients-list') + search[i % len(search)],
+             None),
+            ('short-link', anonymous, 'get', 302,
+             lambda i: reverse('short-link', args=(codes[i],)),
+             None),
+        )
+
+        results = {}
+        for name, api_client, method, status, url, data in endpoints:
+            measurement = Measurement(name)
+            for iteration in range(iterations):
+                kwargs = {'format': 'json'}
+                if data:
+                    kwargs['data'] = data(iteration)
+                measure(measurement, lambda: getattr(api_client, method)(
+                    url(iteration), **kwargs
+                ))
+            if measurement.statuses != {status}:
+                raise CommandError(
+                    f'{name}: ожидался ответ {status}, '
+                    f'получено {sorted(measurement.statuses)}.'
+                )
+            results[name] = measurement.as_dict()
+        return results
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"эндпоинт":34} {"SQL":>5} {"p50, мс":>9} {"p95, мс":>9} '
+            f'{"байт":>9}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:34} {result["queries"]:>5} {result["p50_ms"]:>9} '
+                f'{result["p95_ms"]:>9} {result["size"]:>9}'
+            )
+
+    @staticmethod
+    def load(path, missing):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден, {missing}.')
+
+    def check_budget(self, results, options):
+        """Число SQL-запросов и размер ответа: не зависят от машины."""
+        budget = self.load(
+            options['budget'], 'запустите команду с --update-budget'
+        )
+        errors = []
+        for name, result in results.items():
+            if name not in budget:
+                self.stdout.write(
+                    self.style.WARNING(f'{name}: нет в бюджете.')
+                )
+                continue
+            limit = budget[name]
+            if result['queries'] > limit['queries']:
+                errors.append(
+                    f'{name}: {result["queries"]} SQL-запросов, '
+                    f'бюджет {limit["queries"]}.'
+                )
+            size_limit = limit['size'] * options['size_tolerance']
+            if result['size'] > size_limit:
+                errors.append(
+                    f'{name}: ответ {result["size"]} байт, '
+                    f'бюджет {size_limit:.0f} байт.'
+                )
+        return errors
+
+    def check_latency(self, results, options):
+        """
+        p95 относительно прошлого замера на той же машине: абсолютные
+        задержки между машинами не сравнимы, а p95 зависит от числа
+        итераций.
+        """
+        baseline = self.load(
+            options['latency_baseline'],
+            'сохраните замер этой машины через --report',
+        )
+        errors = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            p95_limit = (
+                baseline[name]['p95_ms'] * options['latency_tolerance']
+            )
+            if result['p95_ms'] > p95_limit:
+                errors.append(
+                    f'{name}: p95 {result["p95_ms"]} мс, '
+                    f'прошлый замер {baseline[name]["p95_ms"]} мс, '
+                    f'допустимо {p95_limit:.2f} мс.'
+                )
+        return errors
@@ -0,0 +1,330 @@
+import base64
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import parsers, renderers
+from rest_framework.test import APIClient
+
+from api import fast_json
+from api.benchmark import BENCH_IMAGE, Measurement, make_image, seed_dataset
+from api.parsers import JSONParser
+from api.renderers import JSONRenderer
+from recipes.images import make_derivatives
+
+
+MEDIA_TYPE = 'application/json'
+
+# Данные, на которых orjson и стандартный json расходятся чаще всего.
+EDGE_DATA = (
+    {'text': 'строка\u2028абзац\u2029 😀 \x00\x1f\x7f "\\ </script>'},
+    {
+        'decimal': Decimal('12.50'),
+        'datetime': datetime.datetime(
+            2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+        ),
+        'naive': datetime.datetime(2024, 5, 1, 12, 30),
+        'date': datetime.date(2024, 5, 1),
+        'time': datetime.time(12, 30, 15, 123456),
+        'timedelta': datetime.timedelta(hours=1, seconds=5),
+        'uuid': uuid.UUID(int=42),
+    },
+    {
+        'wide': 2 ** 70,
+        'edges': [2 ** 63 - 1, -2 ** 63, 2 ** 64 - 1],
+        'floats': [0.1, 0.0001, 1.5, -0.0, 123456789012345.6],
+        'scalars': [0, -1, True, False, None],
+    },
+    {1: 'целый ключ', None: 'ключ null', 'lazy': gettext_lazy('Рецепт')},
+    {'bytes': b'bytes', 'tuple': (1, 2), 'nested': [[[{'a': []}]]]},
+    'строка',
+    42,
+    [],
+)
+# Документированные в api.fast_json отличия orjson: данные, результат
+# стандартного json и orjson. Ошибка задаётся названием исключения.
+FLOAT_DIFFERENCES = (
+    ([1e+16, 1e+20, 1.5e+300], b'[1e+16,1e+20,1.5e+300]',
+     b'[1e16,1e20,1.5e300]'),
+    ([1.5e-07, 1e-05, -2.5e-10], b'[1.5e-07,1e-05,-2.5e-10]',
+     b'[1.5e-7,0.00001,-2.5e-10]'),
+    ([Decimal('1E-7'), Decimal('1E+20')], b'[1e-07,1e+20]', b'[1e-7,1e20]'),
+    ({1e-05: 'ключ'}, '{"1e-05":"ключ"}'.encode(),
+     '{"0.00001":"ключ"}'.encode()),
+    ([float('nan')], 'ValueError', b'[null]'),
+    ([float('inf'), float('-inf')], 'ValueError', b'[null,null]'),
+)
+EDGE_BODIES = (
+    b'{"a": 1, "a": 2}',
+    b'123456789012345678901234567890',
+    b'[18446744073709551615, -9223372036854775808, 1e400, 1.0]',
+    b'{"s": "\\ud800"}',
+    b'{"text": "\\u0441\\u0442\\u0440\\u2028 \\"\\\\ \\/"}',
+    b'{"a": NaN}',
+    b'\xef\xbb\xbf{}',
+    b'{"a": "\xff"}',
+    b'',
+    b'[1, 2',
+    b'  {"nested": [[[[{}]]]]}  ',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка и замер JSON рендерера и парсера API (JSON_BACKEND) '
+        'на ответах списка рецептов и теле создания рецепта с картинкой: '
+        'orjson должен давать те же байты и данные, что стандартный json.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--favorites', type=int, default=2000)
+        parser.add_argument('--subscriptions', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument(
+            '--image-mb', type=float, default=3,
+            help='Размер картинки в теле создания рецепта, МБ.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--report', help='Сохранить результаты замеров в JSON файл.'
+        )
+
+    def handle(self, *args, **options):
+        if fast_json.orjson is None:
+            raise CommandError('orjson не установлен, сравнивать не с чем.')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    payloads = self.get_payloads(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        bodies = self.get_bodies(options['image_mb'])
+        self.check_parity(payloads, bodies)
+        iterations = options['iterations']
+        results = {
+            'render': {
+                name: self.measure(self.render_call(data), iterations)
+                for name, data in payloads.items()
+            },
+            'parse': {
+                name: self.measure(self.parse_call(body), iterations)
+                for name, body in bodies.items()
+            },
+        }
+        for name, data in payloads.items():
+            results['render'][name]['size_kb'] = round(
+                len(renderers.JSONRenderer().render(data)) / 1024, 1
+            )
+        for name, body in bodies.items():
+            results['parse'][name]['size_kb'] = round(len(body) / 1024, 1)
+        self.print_results(results)
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def get_payloads(self, options):
+        """Данные ответов API до рендеринга, как их получает рендерер."""
+        self.stdout.write('Наполнение тестовой базы...')
+        dataset = seed_dataset(
+            options['users'], options['recipes'], options['favorites'],
+            options['subscriptions'], seed=options['seed'],
+        )
+        default_storage.save(BENCH_IMAGE, ContentFile(
+            base64.b64decode(make_image().split(',', 1)[1])
+        ))
+        make_derivatives(BENCH_IMAGE)
+        anonymous = APIClient()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+        recipes = reverse('recipes-list')
+        urls = {
+            'recipes-6': (anonymous, recipes + '?limit=6'),
+            'recipes-50': (client, recipes + '?limit=50'),
+            'recipes-200': (client, recipes + '?limit=200'),
+            'recipe-detail': (client, reverse(
+                'recipes-detail', args=(dataset.recipes[0],)
+            )),
+            'subscriptions': (client, reverse('users-subscriptions')),
+            'ingredients': (anonymous, reverse('ingredients-list')),
+        }
+        payloads = {}
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+            for name, (api_client, url) in urls.items():
+                response = api_client.get(url, HTTP_ACCEPT=MEDIA_TYPE)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{name}: {url} ответил {response.status_code}.'
+                    )
+                payloads[name] = response.data
+        return payloads
+
+    @staticmethod
+    def get_bodies(image_mb):
+        """Тела запросов фронтенда: рецепт с картинкой и без, регистрация."""
+        image = base64.b64encode(os.urandom(int(image_mb * 2 ** 20)))
+        recipe = {
+            'ingredients': [
+                {'id': ingredient, 'amount': 10}
+                for ingredient in range(1, 21)
+            ],
+            'tags': [1, 2],
+            'image': f'data:image/png;base64,{image.decode()}',
+            'name': 'Рецепт',
+            'text': 'Описание рецепта. ' * 50,
+            'cooking_time': 30,
+        }
+        bodies = {'recipe-create': recipe}
+        bodies['recipe-update'] = dict(recipe)
+        del bodies['recipe-update']['image']
+        bodies['signup'] = {
+            'email': 'user@foodgram.local',
+            'username': 'user',
+            'first_name': 'Имя',
+            'last_name': 'Фамилия',
+            'password': 'Benchmark-password-42',
+        }
+        return {
+            name: json.dumps(body, ensure_ascii=False).encode()
+            for name, body in bodies.items()
+        }
+
+    @staticmethod
+    def render(renderer, data, media_type=MEDIA_TYPE):
+        try:
+            return renderer.render(data, media_type, {})
+        except (TypeError, ValueError) as error:
+            return f'{type(error).__name__}: {error}'
+
+    @staticmethod
+    def parse(parser, body):
+        try:
+            return repr(parser.parse(
+                io.BytesIO(body), MEDIA_TYPE, {'encoding': 'utf-8'}
+            ))
+        except Exception as error:
+            return f'{type(error).__name__}: {error}'
+
+    @staticmethod
+    def matches(result, expected):
+        if isinstance(expected, bytes):
+            return result == expected
+        return isinstance(result, str) and result.startswith(expected)
+
+    def check_parity(self, payloads, bodies):
+        """Сравнить с DRF: байты ответов и разобранные тела запросов."""
+        errors = []
+        cases = [
+            (name, data, MEDIA_TYPE) for name, data in payloads.items()
+        ] + [
+            (f'edge-{index}', data, MEDIA_TYPE)
+            for index, data in enumerate(EDGE_DATA)
+        ] + [('recipes-6-indent', payloads['recipes-6'],
+              f'{MEDIA_TYPE}; indent=4')]
+        with override_settings(JSON_BACKEND='orjson'):
+            for name, data, media_type in cases:
+                expected = self.render(
+                    renderers.JSONRenderer(), data, media_type
+                )
+                content = self.render(JSONRenderer(), data, media_type)
+                if expected != content:
+                    errors.append(f'рендер {name}: {expected[:200]!r}\n'
+                                  f'{" " * len(name)}  {content[:200]!r}')
+            for index, (data, stdlib, fast) in enumerate(FLOAT_DIFFERENCES):
+                name = f'float-{index}'
+                expected = self.render(renderers.JSONRenderer(), data)
+                content = self.render(JSONRenderer(), data)
+                if not (self.matches(expected, stdlib)
+                        and self.matches(content, fast)):
+                    errors.append(f'отличие {name}: {expected!r}\n'
+                                  f'{" " * len(name)}  {content!r}')
+            parse_cases = [
+                (f'{name}-response', renderers.JSONRenderer().render(data))
+                for name, data in payloads.items()
+            ] + list(bodies.items()) + [
+                (f'edge-{index}', body)
+                for index, body in enumerate(EDGE_BODIES)
+            ]
+            for name, body in parse_cases:
+                expected = self.parse(parsers.JSONParser(), body)
+                result = self.parse(JSONParser(), body)
+                if expected != result:
+                    errors.append(f'парсер {name}: {expected[:200]}\n'
+                                  f'{" " * len(name)}  {result[:200]}')
+        if errors:
+            raise CommandError(
+                'Результат отличается от стандартного json:\n'
+                + '\n'.join(errors)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рендер совпадает в {len(cases)} случаях, '
+            f'отличия float как описано в {len(FLOAT_DIFFERENCES)}, '
+            f'разбор совпадает в {len(parse_cases)}.'
+        ))
+
+    @staticmethod
+    def render_call(data):
+        renderer = JSONRenderer()
+        return lambda: renderer.render(data, MEDIA_TYPE, {})
+
+    @staticmethod
+    def parse_call(body):
+        parser = JSONParser()
+        return lambda: parser.parse(
+            io.BytesIO(body), MEDIA_TYPE, {'encoding': 'utf-8'}
+        )
+
+    @staticmethod
+    def measure(call, iterations):
+        result = {}
+        for backend in ('stdlib', 'orjson'):
+            timings = []
+            with override_settings(JSON_BACKEND=backend):
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    call()
+                    timings.append((time.perf_counter() - start) * 1000)
+            result[f'{backend}_p50_ms'] = round(
+                Measurement.percentile(timings, 50), 3
+            )
+        result['speedup'] = round(
+            result['stdlib_p50_ms'] / max(result['orjson_p50_ms'], 0.001), 2
+        )
+        return result
+
+    def print_results(self, results):
+        for step, title in (('render', 'рендер'), ('parse', 'разбор')):
+            self.stdout.write(
+                f'{title:16} {"КБ":>8} {"stdlib, мс":>11} '
+                f'{"orjson, мс":>11} {"ускорение":>10}'
+            )
+            for name, result in results[step].items():
+                self.stdout.write(
+                    f'{name:16} {result["size_kb"]:>8} '
+                    f'{result["stdlib_p50_ms"]:>11} '
+                    f'{result["orjson_p50_ms"]:>11} '
+                    f'{result["speedup"]:>10}'
+                )
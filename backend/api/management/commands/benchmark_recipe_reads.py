@@ -0,0 +1,221 @@
+import base64
+import json
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.benchmark import BENCH_IMAGE, Measurement, make_image, seed_dataset
+from recipes.images import make_derivatives
+
+
+User = get_user_model()
+
+AVATAR = 'avatars/benchmark.png'
+
+
+def parse_server_timing(header):
+    """Длительности фаз из заголовка `Server-Timing`, мс."""
+    phases = {}
+    for part in header.split(','):
+        name, *params = part.strip().split(';')
+        for param in params:
+            if param.startswith('dur='):
+                phases[name] = float(param[4:])
+    return phases
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка и замер быстрого чтения рецептов (FAST_RECIPE_READS) '
+        'с RecipeSerializer на отдельной тестовой базе: ответы списка '
+        'и карточки рецепта должны совпадать байт в байт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--favorites', type=int, default=10000)
+        parser.add_argument('--subscriptions', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--report', help='Сохранить результаты замеров в JSON файл.'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    results = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_results(results)
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def get_scenarios(self, options):
+        self.stdout.write('Наполнение тестовой базы...')
+        dataset = seed_dataset(
+            options['users'], options['recipes'], options['favorites'],
+            options['subscriptions'], seed=options['seed'],
+        )
+        image = base64.b64decode(make_image().split(',', 1)[1])
+        default_storage.save(BENCH_IMAGE, ContentFile(image))
+        default_storage.save(AVATAR, ContentFile(image))
+        # Копии создаются заранее: ответы не зависят от фонового потока.
+        make_derivatives(BENCH_IMAGE)
+        User.objects.filter(id__in=dataset.authors[:50]).update(avatar=AVATAR)
+
+        anonymous = APIClient()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {dataset.token}')
+        recipes = reverse('recipes-list')
+        detail = reverse('recipes-detail', args=(dataset.recipes[0],))
+        own = reverse('recipes-detail', args=(dataset.own_recipes[0],))
+        tags = '&'.join(f'tags={tag.slug}' for tag in dataset.tags[:2])
+        return [
+            ('list', anonymous, recipes),
+            ('list-auth', client, recipes),
+            ('list-limit-50', client, recipes + '?limit=50'),
+            ('list-deep-page', anonymous, recipes + '?page=20&limit=6'),
+            ('list-cursor', client, recipes + '?cursor=&limit=6'),
+            ('list-tags', client, f'{recipes}?{tags}'),
+            ('list-search', anonymous, recipes + '?search=Рецепт'),
+            ('list-favorited', client, recipes + '?is_favorited=1'),
+            ('list-cart', client, recipes + '?is_in_shopping_cart=1'),
+            ('list-author', client,
+             f'{recipes}?author={dataset.actor.id}'),
+            ('list-empty', client, recipes + '?page=1000'),
+            ('detail', anonymous, detail),
+            ('detail-auth', client, detail),
+            ('detail-own', client, own),
+            ('detail-missing', client,
+             reverse('recipes-detail', args=(10 ** 9,))),
+        ]
+
+    def run_benchmark(self, options):
+        scenarios = self.get_scenarios(options)
+        # Ответы анонимам не кэшируются: замеряется каждый запрос.
+        # Фазы берутся из Server-Timing, без DEBUG он выключен.
+        with override_settings(
+            RESPONSE_CACHE_TIMEOUT=0, SERVER_TIMING_HEADER=True
+        ):
+            self.check_parity(scenarios)
+            return {
+                name: self.measure(api_client, url, options['iterations'])
+                for name, api_client, url in scenarios
+            }
+
+    def check_parity(self, scenarios):
+        """Сверить ответы; следующие страницы списков тоже сверяются."""
+        errors = []
+        for name, api_client, url in scenarios:
+            responses = []
+            for fast in (False, True):
+                with override_settings(FAST_RECIPE_READS=fast):
+                    response = api_client.get(url)
+                responses.append((response.status_code, response.content))
+            (status, expected), (fast_status, content) = responses
+            if (status, expected) != (fast_status, content):
+                start = max(0, next(
+                    (
+                        index for index, (left, right)
+                        in enumerate(zip(expected, content)) if left != right
+                    ),
+                    min(len(expected), len(content)),
+                ) - 100)
+                errors.append(
+                    f'{name}: {status} ...{expected[start:start + 200]!r}\n'
+                    f'{" " * len(name)}  {fast_status} '
+                    f'...{content[start:start + 200]!r}'
+                )
+                continue
+            next_page = self.get_next_page(content)
+            if next_page and not name.endswith('-next'):
+                scenarios.append((f'{name}-next', api_client, next_page))
+        if errors:
+            raise CommandError(
+                'Ответы отличаются от RecipeSerializer:\n' + '\n'.join(errors)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Ответы совпадают в {len(scenarios)} сценариях.'
+        ))
+
+    @staticmethod
+    def get_next_page(content):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and data.get('next'):
+            return data['next'].replace('http://testserver', '')
+        return None
+
+    def measure(self, api_client, url, iterations):
+        result = {}
+        for fast in (False, True):
+            total = Measurement(url)
+            view = Measurement(url)
+            with override_settings(FAST_RECIPE_READS=fast):
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    response = api_client.get(url)
+                    total.timings.append(
+                        (time.perf_counter() - start) * 1000
+                    )
+                    phases = parse_server_timing(response['Server-Timing'])
+                    view.timings.append(
+                        phases.get('view', 0) + phases.get('render', 0)
+                    )
+            mode = 'rows' if fast else 'serializer'
+            result[f'{mode}_p50_ms'] = round(total.percentile(
+                total.timings, 50
+            ), 2)
+            result[f'{mode}_view_p50_ms'] = round(view.percentile(
+                view.timings, 50
+            ), 2)
+        result['speedup'] = round(
+            result['serializer_p50_ms'] / result['rows_p50_ms'], 2
+        )
+        result['view_speedup'] = round(
+            result['serializer_view_p50_ms']
+            / max(result['rows_view_p50_ms'], 0.01), 2
+        )
+        return result
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"сценарий":20} {"запрос, мс":>21} {"без SQL, мс":>21} '
+            f'{"ускорение":>16}'
+        )
+        self.stdout.write(
+            f'{"":20} {"serializer":>10} {"rows":>10} {"serializer":>10} '
+            f'{"rows":>10} {"всего":>7} {"без SQL":>8}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:20} {result["serializer_p50_ms"]:>10} '
+                f'{result["rows_p50_ms"]:>10} '
+                f'{result["serializer_view_p50_ms"]:>10} '
+                f'{result["rows_view_p50_ms"]:>10} '
+                f'{result["speedup"]:>7} {result["view_speedup"]:>8}'
+            )
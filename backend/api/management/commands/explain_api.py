@@ -0,0 +1,161 @@
+from collections import Counter
+from itertools import combinations
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.explain import PlanAuditor
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import WORD
+
+
+User = get_user_model()
+
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Аудит планов SQL-запросов эндпоинтов API на текущей базе: '
+        'EXPLAIN для каждого запроса с отметками о последовательных '
+        'чтениях, сортировках без индекса и соединениях только для '
+        'сортировки. Кэш отключается, изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='Id пользователя, от имени которого выполняются запросы.'
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Таблицы меньшего размера не отмечаются.'
+        )
+        parser.add_argument(
+            '--show-sql', action='store_true',
+            help='Выводить SQL запросов с замечаниями.'
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если есть замечания.'
+        )
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError('В базе нет рецептов, проверять нечего.')
+        user = self.get_user(options['user'])
+        auditor = PlanAuditor(options['min_rows'])
+        client = APIClient()
+        client.force_authenticate(user)
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=DUMMY_CACHES), (
+                transaction.atomic()
+            ):
+                found = Counter()
+                for name, url in self.get_endpoints(user):
+                    found.update(
+                        self.audit(client, auditor, name, url, options)
+                    )
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        if not found:
+            self.stdout.write(self.style.SUCCESS('Замечаний нет.'))
+            return
+        self.stdout.write('\nИтого по замечаниям (число эндпоинтов):')
+        for issue, count in found.most_common():
+            self.stdout.write(f'  {issue} — {count}')
+        if options['strict']:
+            raise CommandError(f'Найдено замечаний: {len(found)}.')
+
+    def get_user(self, user_id):
+        if user_id is None:
+            return User.objects.order_by('-following_count', 'id').first()
+        try:
+            return User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь с id {user_id} не найден.')
+
+    def get_endpoints(self, user):
+        """Эндпоинты с параметрами, подобранными по данным в базе."""
+        recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+        author = User.objects.order_by('-recipes_count', 'id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        recipes = reverse('recipes-list')
+        filters = {
+            'tags': {'tags': list(
+                Tag.objects.values_list('slug', flat=True)[:2]
+            )},
+            'author': {'author': author.id},
+            'is_favorited': {'is_favorited': 1},
+            'is_in_shopping_cart': {'is_in_shopping_cart': 1},
+            'search': {'search': (WORD.findall(recipe.name) or ['а'])[0]},
+        }
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                params = {}
+                for name in names:
+                    params.update(filters[name])
+                yield (
+                    f'recipes-list[{",".join(names)}]',
+                    f'{recipes}?{urlencode(params, doseq=True)}',
+                )
+        yield (
+            'recipes-list[tags_match=all]',
+            f'{recipes}?{urlencode(filters["tags"], doseq=True)}'
+            '&tags_match=all',
+        )
+        yield 'recipes-list[cursor]', f'{recipes}?cursor='
+        yield 'recipes-detail', reverse('recipes-detail', args=[recipe.id])
+        yield (
+            'recipes-download-shopping-cart',
+            reverse('recipes-download-shopping-cart') + '?format=json',
+        )
+        yield 'users-list', reverse('users-list')
+        yield 'users-subscriptions', reverse('users-subscriptions')
+        yield 'tags-list', reverse('tags-list')
+        # Список и поиск ингредиентов отдаются из индекса в памяти
+        # процесса, в базу ходит только карточка ингредиента. Поиск
+        # по базе проверяется в recipes-list[search].
+        if ingredient:
+            yield (
+                'ingredients-detail',
+                reverse('ingredients-detail', args=[ingredient.id]),
+            )
+
+    def audit(self, client, auditor, name, url, options):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        found = set()
+        lines = []
+        for query in context.captured_queries:
+            issues = set(auditor.audit(query['sql'])) - found
+            found.update(issues)
+            if issues:
+                lines += [f'  {issue}' for issue in issues]
+                if options['show_sql']:
+                    lines.append(f'    {query["sql"]}')
+        style = self.style.WARNING if found else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{name}: ответ {response.status_code}, '
+            f'запросов {len(context)}, замечаний {len(found)}'
+        ))
+        for line in lines:
+            self.stdout.write(line)
+        return found
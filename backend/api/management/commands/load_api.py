@@ -0,0 +1,97 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.load_test import JOURNEYS, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон запущенного бэкенда: виртуальные пользователи '
+        'регистрируются, получают токен и параллельно проходят сценарии '
+        'клиента. Печатает пропускную способность, p50/p95/p99 и долю '
+        'ошибок по шагам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Число одновременных виртуальных пользователей.'
+        )
+        parser.add_argument(
+            '--iterations', type=int,
+            help='Итераций сценариев на пользователя.'
+        )
+        parser.add_argument(
+            '--duration', type=float,
+            help='Длительность прогона, сек.'
+        )
+        parser.add_argument(
+            '--journeys', nargs='+', choices=JOURNEYS, default=JOURNEYS,
+            help='Сценарии итерации, по умолчанию все.'
+        )
+        parser.add_argument(
+            '--think-time', type=float, default=0,
+            help='Средняя пауза пользователя между итерациями, сек.'
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--report', help='Сохранить отчёт в JSON файл.'
+        )
+        parser.add_argument(
+            '--max-error-rate', type=float,
+            help='Завершиться с ошибкой, если доля ошибок выше.'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] is None and options['duration'] is None:
+            options['iterations'] = 10
+        self.stdout.write(
+            f'{options["concurrency"]} пользователей, {options["url"]}...'
+        )
+        try:
+            report = run_load(
+                options['url'],
+                options['concurrency'],
+                iterations=options['iterations'],
+                duration=options['duration'],
+                journeys=options['journeys'],
+                think_time=options['think_time'],
+                timeout=options['timeout'],
+                seed=options['seed'],
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        self.print_report(report)
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+        limit = options['max_error_rate']
+        if limit is not None and report['error_rate'] > limit:
+            raise CommandError(
+                f'Доля ошибок {report["error_rate"]} выше {limit}.'
+            )
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"шаг":20} {"запросов":>9} {"в сек.":>8} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"p99, мс":>9} {"ошибки":>7}'
+        )
+        for name, step in report['steps'].items():
+            self.stdout.write(
+                f'{name:20} {step["requests"]:>9} {step["rps"]:>8} '
+                f'{step["p50_ms"]:>9} {step["p95_ms"]:>9} '
+                f'{step["p99_ms"]:>9} {step["error_rate"]:>7.1%}'
+            )
+        summary = (
+            f'Всего {report["requests"]} запросов за '
+            f'{report["duration_s"]} с, {report["rps"]} в сек., '
+            f'ошибок {report["error_rate"]:.1%}.'
+        )
+        if report['errors']:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
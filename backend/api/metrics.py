@@ -0,0 +1,242 @@
+"""
+Метрики процесса: счётчики (попадания в кэши, соединения с базой и т.п.)
+и гистограммы запросов по маршрутам, в формате Prometheus.
+Каждый процесс копит свои значения. При `METRICS_DIR` процессы
+раз в `METRICS_PUBLISH_INTERVAL` секунд записывают их в файлы этого
+каталога, а отдаётся сумма по всем файлам: при нескольких воркерах
+значения не зависят от того, какой воркер ответил, и не убывают.
+"""
+import atexit
+import json
+import os
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from django.conf import settings
+
+
+PREFIX = 'foodgram_'
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Время обработки запроса.', DURATION_BUCKETS
+    ),
+    'http_request_sql_queries': (
+        'Число SQL-запросов за запрос.', QUERY_BUCKETS
+    ),
+    'http_request_sql_duration_seconds': (
+        'Время SQL-запросов за запрос.', DURATION_BUCKETS
+    ),
+    'http_request_view_duration_seconds': (
+        'Время представления DRF без SQL: сериализация и логика.',
+        DURATION_BUCKETS,
+    ),
+    'http_request_render_duration_seconds': (
+        'Время рендеринга ответа DRF.', DURATION_BUCKETS
+    ),
+    'http_response_size_bytes': ('Размер ответа.', SIZE_BUCKETS),
+}
+
+
+class Counters:
+    """Потокобезопасный набор именованных счётчиков."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.values = Counter()
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.values[name] += value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class Histograms:
+    """
+    Гистограммы из `HISTOGRAMS` по наборам меток: по каждому набору
+    число наблюдений в корзинах, их сумма и количество.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.series = {}
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.series:
+                self.series[key] = [[0] * (len(buckets) + 1), 0, 0]
+            counts, _, _ = series = self.series[key]
+            counts[bisect_left(buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self.series.items()
+            }
+
+
+counters = Counters()
+histograms = Histograms()
+
+
+def dump_snapshot():
+    return {
+        'counters': counters.snapshot(),
+        'histograms': [
+            [name, labels, counts, total, count]
+            for (name, labels), (counts, total, count)
+            in histograms.snapshot().items()
+        ],
+    }
+
+
+def merge_snapshots(snapshots):
+    """Сумма счётчиков и гистограмм нескольких процессов."""
+    values = Counter()
+    series = {}
+    for snapshot in snapshots:
+        values.update(snapshot['counters'])
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key not in series:
+                series[key] = ([0] * len(counts), 0, 0)
+            merged, merged_total, merged_count = series[key]
+            series[key] = (
+                [a + b for a, b in zip(merged, counts)],
+                merged_total + total,
+                merged_count + count,
+            )
+    return dict(values), series
+
+
+class Publisher:
+    """
+    Запись значений процесса в `<pid>.json` каталога `METRICS_DIR`
+    фоновым потоком раз в `interval` секунд и при завершении процесса.
+    Файлы завершившихся воркеров остаются: их значения входят в сумму,
+    поэтому счётчики не убывают при перезапуске воркера. Поток
+    запускается при первом запросе, обслуженном процессом.
+    """
+
+    def __init__(self, directory, interval):
+        self.directory = Path(directory) if directory else None
+        self.interval = interval
+        self.lock = Lock()
+        self.wake = Event()
+        self.thread = None
+
+    def start(self):
+        if self.directory is None or (
+            self.thread is not None and self.thread.is_alive()
+        ):
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(
+                    target=self.run, name='metrics-publisher', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.publish()
+
+    def publish(self):
+        if self.directory is None:
+            return
+        path = self.directory / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        # Файл процесса пишут и фоновый поток, и запрос к метрикам.
+        with self.lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                temporary.write_text(json.dumps(dump_snapshot()))
+                os.replace(temporary, path)
+            except OSError:
+                pass
+
+    def collect(self):
+        """Значения всех процессов, включая свежие значения текущего."""
+        if self.directory is None:
+            return counters.snapshot(), histograms.snapshot()
+        self.publish()
+        snapshots = []
+        for path in self.directory.glob('*.json'):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+
+publisher = Publisher(settings.METRICS_DIR, settings.METRICS_PUBLISH_INTERVAL)
+atexit.register(publisher.publish)
+
+
+def hit_rate(hits, misses):
+    """Доля попаданий; None, пока обращений не было."""
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+def format_labels(labels):
+    def escape(value):
+        return (
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n')
+        )
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels
+    ) + '}'
+
+
+def render_prometheus(values, series):
+    """Счётчики и гистограммы в текстовом формате Prometheus 0.0.4."""
+    lines = []
+    for name, value in sorted(values.items()):
+        lines += [
+            f'# TYPE {PREFIX}{name}_total counter',
+            f'{PREFIX}{name}_total {value}',
+        ]
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [
+            f'# HELP {PREFIX}{name} {help_text}',
+            f'# TYPE {PREFIX}{name} histogram',
+        ]
+        for (series_name, labels), (counts, total, count) in sorted(
+            series.items()
+        ):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*map(str, buckets), '+Inf'), counts
+            ):
+                cumulative += bucket_count
+                bucket_labels = format_labels((*labels, ('le', bound)))
+                lines.append(
+                    f'{PREFIX}{name}_bucket{bucket_labels} {cumulative}'
+                )
+            lines += [
+                f'{PREFIX}{name}_sum{format_labels(labels)} {total}',
+                f'{PREFIX}{name}_count{format_labels(labels)} {count}',
+            ]
+    return '\n'.join(lines) + '\n'
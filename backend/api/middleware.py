@@ -0,0 +1,76 @@
+import asyncio
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from api.metrics import publisher
+from api.nplusone import detect_queries
+from api.timing import RequestTiming, current
+
+
+def get_labels(request, response):
+    """Метки гистограмм: имя маршрута (`recipes-detail`), метод, статус."""
+    match = request.resolver_match
+    return {
+        'route': match.url_name if match and match.url_name else 'unmatched',
+        'method': request.method,
+        'status': response.status_code,
+    }
+
+
+def finish(request, response, timing):
+    timing.finish(response)
+    if settings.SERVER_TIMING_HEADER:
+        response['Server-Timing'] = timing.server_timing()
+    timing.observe(get_labels(request, response))
+    publisher.start()
+    return response
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """
+    Замер каждого запроса: заголовок `Server-Timing` и гистограммы
+    маршрутов для `/metrics`. Работает и под WSGI, и под ASGI
+    без переключения потоков.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timing = RequestTiming()
+            token = current.set(timing)
+            try:
+                response = await get_response(request)
+            finally:
+                current.reset(token)
+            return finish(request, response, timing)
+    else:
+        def middleware(request):
+            timing = RequestTiming()
+            token = current.set(timing)
+            try:
+                response = get_response(request)
+            finally:
+                current.reset(token)
+            return finish(request, response, timing)
+    return middleware
+
+
+@sync_and_async_middleware
+def nplusone_middleware(get_response):
+    """
+    Повторяющиеся SQL-запросы каждого запроса по `NPLUSONE_MODE`:
+    предупреждение в лог или исключение, которое тестовый клиент
+    выбросит в тесте.
+    """
+    if settings.NPLUSONE_MODE == 'off':
+        raise MiddlewareNotUsed
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with detect_queries(f'{request.method} {request.path}'):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with detect_queries(f'{request.method} {request.path}'):
+                return get_response(request)
+    return middleware
@@ -0,0 +1,142 @@
+"""
+Поиск N+1 при разработке и в тестах. SQL-запросы запроса группируются
+по форме (текст без значений параметров), форма, повторённая больше
+`NPLUSONE_THRESHOLD` раз, сообщается вместе со стеком кода проекта,
+из которого выполнялся запрос, например
+`RecipeSerializer.get_is_favorited`. В режиме `warn` сообщение пишется
+в лог, в режиме `raise` выбрасывается исключение `NPlusOneError`.
+"""
+import logging
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('query_shapes', default=None)
+
+STACK_DEPTH = 5
+# Модули замеров не показываются в стеке.
+SKIPPED_MODULES = {__name__, 'api.timing', 'api.middleware'}
+
+LITERALS = re.compile(
+    r"'(?:[^']|'')*'"
+    r'|\b\d+(?:\.\d+)?\b'
+    r'|%s'
+)
+LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACES = re.compile(r'\s+')
+SAVEPOINTS = re.compile(r'^(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO)')
+
+
+class NPlusOneError(Exception):
+    """Запрос одной формы повторён больше допустимого."""
+
+
+def normalize(sql):
+    """Форма запроса: значения и списки `IN (...)` заменены на `?`."""
+    sql = LITERALS.sub('?', sql)
+    sql = LISTS.sub('(?)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def is_project_code(frame):
+    filename = frame.f_code.co_filename
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and frame.f_globals.get('__name__') not in SKIPPED_MODULES
+    )
+
+
+def get_caller(frame):
+    """`Класс.метод` или `модуль.функция` кадра."""
+    code = frame.f_code
+    owner = frame.f_locals.get('self', frame.f_locals.get('cls'))
+    if owner is not None:
+        if not isinstance(owner, type):
+            owner = type(owner)
+        name = f'{owner.__name__}.{code.co_name}'
+    else:
+        name = f'{Path(code.co_filename).stem}.{code.co_name}'
+    return f'{name} ({Path(code.co_filename).name}:{frame.f_lineno})'
+
+
+def get_stack():
+    """Кадры кода проекта, начиная с ближайшего к запросу."""
+    stack = []
+    frame = sys._getframe(1)
+    while frame is not None and len(stack) < STACK_DEPTH:
+        if is_project_code(frame):
+            stack.append(get_caller(frame))
+        frame = frame.f_back
+    return tuple(stack)
+
+
+class QueryShapes:
+    """Формы запросов одного HTTP-запроса или блока кода."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.shapes = defaultdict(Counter)
+
+    def add(self, sql, stack):
+        if not SAVEPOINTS.match(sql):
+            self.shapes[normalize(sql)][stack] += 1
+
+    def repeated(self):
+        """Формы, повторённые больше порога: (форма, число, стек)."""
+        return [
+            (shape, sum(stacks.values()), stacks.most_common(1)[0][0])
+            for shape, stacks in self.shapes.items()
+            if sum(stacks.values()) > self.threshold
+        ]
+
+    def report(self, label):
+        lines = []
+        for shape, count, stack in self.repeated():
+            lines.append(f'{label}: запрос повторён {count} раз: {shape}')
+            lines += [f'    {caller}' for caller in stack]
+        return '\n'.join(lines)
+
+
+def record_shape(execute, sql, params, many, context):
+    """Обёртка выполнения SQL, см. `connection.execute_wrapper`."""
+    shapes = current.get()
+    if shapes is not None:
+        shapes.add(sql, get_stack())
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def detect_queries(label='N+1', mode=None, threshold=None):
+    """
+    Проверить запросы блока кода, например в тесте:
+
+        with detect_queries(mode='raise'):
+            client.get('/api/recipes/')
+
+    Режим и порог по умолчанию берутся из `NPLUSONE_MODE`
+    и `NPLUSONE_THRESHOLD`.
+    """
+    mode = mode or settings.NPLUSONE_MODE
+    shapes = QueryShapes(
+        settings.NPLUSONE_THRESHOLD if threshold is None else threshold
+    )
+    token = current.set(shapes)
+    try:
+        yield shapes
+    finally:
+        current.reset(token)
+    message = shapes.report(label)
+    if not message or mode == 'off':
+        return
+    if mode == 'raise':
+        raise NPlusOneError(message)
+    logger.warning(message)
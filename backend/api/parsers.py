@@ -0,0 +1,31 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework import parsers
+
+from api import fast_json
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    JSON DRF; тела в UTF-8 разбирает orjson (`JSON_BACKEND`).
+    Ошибки и тела, которые orjson читает иначе, разбирает DRF:
+    сообщения об ошибках и результат не меняются.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if (
+            not fast_json.is_enabled()
+            or codecs.lookup(encoding).name != 'utf-8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        try:
+            return fast_json.loads(content)
+        except ValueError:
+            return super().parse(
+                io.BytesIO(content), media_type, parser_context
+            )
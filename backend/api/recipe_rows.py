@@ -0,0 +1,195 @@
+"""
+Быстрое чтение рецептов для `list` и `retrieve`. Ответ той же формы,
+что у `RecipeSerializer`, собирается из строк `values()` и связей,
+загруженных тремя запросами, без полей и объектов DRF. Ссылки на файлы
+строятся от префикса хранилища, вычисленного один раз на запрос.
+Запись рецептов по-прежнему идёт через `RecipeSerializer`.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import Http404
+from django.utils.encoding import filepath_to_uri
+from rest_framework.response import Response
+
+from constants import IMAGE_DERIVATIVES
+from recipes.images import get_derivatives_many
+from recipes.models import Recipe, RecipeIngredient, Tag
+
+
+# `pub_date` нужна курсорной пагинации, в ответ не попадает.
+RECIPE_FIELDS = (
+    'id', 'author_id', 'name', 'image', 'text', 'cooking_time',
+    'favorites_count', 'is_favorited', 'is_in_shopping_cart', 'pub_date',
+)
+AUTHOR_FIELDS = (
+    'email', 'id', 'username', 'first_name', 'last_name', 'is_subscribed',
+    'avatar',
+)
+
+
+def recipe_rows(queryset):
+    """Строки рецептов вместо объектов, связи загружает `RecipeRows`."""
+    return queryset.prefetch_related(None).values(*RECIPE_FIELDS)
+
+
+def related_ordering(prefix, model):
+    return [
+        f'-{prefix}__{field[1:]}' if field.startswith('-')
+        else f'{prefix}__{field}'
+        for field in model._meta.ordering
+    ]
+
+
+class MediaUrls:
+    """
+    Абсолютные ссылки на файлы, как у `ImageField` DRF. Для файлового
+    хранилища префикс с хостом запроса вычисляется один раз.
+    """
+
+    def __init__(self, request, storage=default_storage):
+        self.request = request
+        self.storage = storage
+        self.prefix = None
+        if isinstance(storage, FileSystemStorage):
+            self.prefix = self.absolute(storage.base_url)
+
+    def absolute(self, url):
+        if self.request is None:
+            return url
+        return self.request.build_absolute_uri(url)
+
+    def __call__(self, name):
+        if not name:
+            return None
+        if self.prefix is None:
+            return self.absolute(self.storage.url(name))
+        return self.prefix + filepath_to_uri(name).lstrip('/')
+
+
+class RecipeRows:
+    """Представление строк рецептов в формате `RecipeSerializer`."""
+
+    def __init__(self, request, authors):
+        """`authors` — queryset пользователей с флагом `is_subscribed`."""
+        self.request = request
+        self.authors = authors
+        self.media = MediaUrls(request)
+
+    def get_tags(self, ids):
+        through = Recipe.tags.through
+        tags = defaultdict(list)
+        for recipe_id, tag_id, name, slug in through.objects.filter(
+            recipe_id__in=ids
+        ).order_by(*related_ordering('tag', Tag)).values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__slug'
+        ):
+            tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+        return tags
+
+    def get_ingredients(self, ids):
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id, name, unit, amount in (
+            RecipeIngredient.objects.filter(recipe_id__in=ids).values_list(
+                'recipe_id', 'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount',
+            )
+        ):
+            ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+        return ingredients
+
+    def get_authors(self, ids):
+        authors = {}
+        for row in self.authors.filter(id__in=ids).values_list(
+            *AUTHOR_FIELDS
+        ):
+            author = dict(zip(AUTHOR_FIELDS, row))
+            author['avatar'] = self.media(author['avatar'])
+            authors[author['id']] = author
+        return authors
+
+    def get_images(self, names):
+        derivatives = get_derivatives_many(names)
+        images = {}
+        for name in names:
+            if derivatives[name]:
+                images[name] = {
+                    size: self.media(path)
+                    for size, path in derivatives[name].items()
+                }
+            else:
+                images[name] = dict.fromkeys(
+                    (size for size, _ in IMAGE_DERIVATIVES), self.media(name)
+                )
+        return images
+
+    def represent(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        ids = [row['id'] for row in rows]
+        tags = self.get_tags(ids)
+        ingredients = self.get_ingredients(ids)
+        authors = self.get_authors({row['author_id'] for row in rows})
+        images = self.get_images(
+            list({row['image'] for row in rows if row['image']})
+        )
+        return [
+            {
+                'id': row['id'],
+                'tags': tags[row['id']],
+                'author': authors.get(row['author_id']),
+                'ingredients': ingredients[row['id']],
+                'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart'],
+                'name': row['name'],
+                'image': self.media(row['image']),
+                'images': images.get(row['image']),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+                'favorites_count': row['favorites_count'],
+            }
+            for row in rows
+        ]
+
+
+class RecipeRowsMixin:
+    """
+    `list` и `retrieve` через `RecipeRows` при `FAST_RECIPE_READS`.
+    Вьюсет задаёт `get_author_queryset()` — авторов с `is_subscribed`.
+    """
+
+    def represent_rows(self, rows):
+        return RecipeRows(
+            self.request, self.get_author_queryset()
+        ).represent(rows)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_RECIPE_READS:
+            return super().list(request, *args, **kwargs)
+        rows = recipe_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.represent_rows(page))
+        return Response(self.represent_rows(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.FAST_RECIPE_READS:
+            return super().retrieve(request, *args, **kwargs)
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            rows = list(recipe_rows(queryset.filter(pk=lookup)))
+        except (TypeError, ValueError, ValidationError):
+            rows = None
+        if not rows:
+            raise Http404
+        self.check_object_permissions(request, rows[0])
+        return Response(self.represent_rows(rows)[0])
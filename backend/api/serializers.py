@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import transaction
+from django.db.models import Manager, Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework.serializers import (
     CharField,
+    Field,
     IntegerField,
+    ListSerializer,
     ModelSerializer,
     PrimaryKeyRelatedField,
     SerializerMethodField,
@@ -17,12 +21,14 @@ from constants import (
     DEFAULT_MIN_VALUE,
     EMPTY_FIELDS,
     FORBIDDEN_FILE,
+    IMAGE_DERIVATIVES,
     MAX_TIME_MSG,
     MESSAGE_AMOUNT,
     MIN_TIME_MSG,
     RESOLVED_TYPE,
     UNIQUE_FIELDS,
 )
+from recipes.images import get_derivatives_many
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 from shortlinks.models import ShortLink
 from users.models import Subscription
@@ -31,6 +37,71 @@ from users.models import Subscription
 User = get_user_model()
 
 
+def preload_image_derivatives(context, images):
+    """
+    Производные изображений одним обращением к кэшу в контекст
+    сериализатора, уже загруженные повторно не запрашиваются.
+    """
+    derivatives = context.setdefault('image_derivatives', {})
+    names = {image.name for image in images if image} - derivatives.keys()
+    if names:
+        derivatives.update(get_derivatives_many(list(names)))
+    return derivatives
+
+
+class ImageDerivativesField(Field):
+    """
+    Ссылки на уменьшенные копии изображения рецепта по размерам.
+    Пока копий нет или они ещё не проверены, по всем размерам отдаётся
+    ссылка на оригинал: копии создаются в фоне, а не в запросе.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        names = preload_image_derivatives(self.context, [value])[value.name]
+        urls = {
+            size: value.storage.url(name) for size, name in names.items()
+        } if names else dict.fromkeys(
+            (size for size, _ in IMAGE_DERIVATIVES), value.url
+        )
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {size: request.build_absolute_uri(url)
+                for size, url in urls.items()}
+
+
+class ImageDerivativesListSerializer(ListSerializer):
+    """
+    Список рецептов: производные изображений всей страницы
+    загружаются до сериализации одним обращением к кэшу.
+    """
+
+    def get_images(self, items):
+        return (item.image for item in items)
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, Manager) else data)
+        preload_image_derivatives(self.context, self.get_images(items))
+        return super().to_representation(items)
+
+
+class AuthorListSerializer(ImageDerivativesListSerializer):
+    """Список авторов с последними рецептами, загруженными вьюсетом."""
+
+    def get_images(self, items):
+        return (
+            recipe.image
+            for author in items
+            for recipe in getattr(author, 'latest_recipes', ())
+        )
+
+
 class TagSerializer(ModelSerializer):
     """Сериализатор для тегов"""
 
@@ -50,9 +121,12 @@ class IngredientSerializer(ModelSerializer):
 class ShortRecipeSerializer(ModelSerializer):
     """Сериализатор для краткой информации о рецепте."""
 
+    images = ImageDerivativesField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+        list_serializer_class = ImageDerivativesListSerializer
 
 
 class UserSerializer(ModelSerializer):
@@ -95,7 +169,6 @@ class UserRecipeSerializer(UserSerializer):
     """Сериализатор представления рецептов пользователя"""
 
     recipes = SerializerMethodField()
-    recipes_count = IntegerField(read_only=True, source='recipes.count')
 
     class Meta:
         model = User
@@ -110,17 +183,15 @@ class UserRecipeSerializer(UserSerializer):
             'recipes_count',
             'avatar',
         )
+        list_serializer_class = AuthorListSerializer
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        try:
-            recipes_limit = int(request.query_params.get('recipes_limit'))
-        except (ValueError, TypeError):
-            pass
-        else:
-            recipes = recipes[:recipes_limit]
-        return ShortRecipeSerializer(recipes, many=True).data
+        """Последние рецепты автора, загруженные вьюсетом."""
+        return ShortRecipeSerializer(
+            obj.latest_recipes, many=True, context={
+                'image_derivatives': self.context.get('image_derivatives', {})
+            }
+        ).data
 
 
 class SubscribeSerializer(ModelSerializer):
@@ -181,6 +252,7 @@ class RecipeSerializer(ModelSerializer):
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
     image = Base64ImageField()
+    images = ImageDerivativesField(source='image')
     cooking_time = IntegerField(
         validators=(
             MinValueValidator(DEFAULT_MIN_VALUE, MIN_TIME_MSG),
@@ -192,25 +264,20 @@ class RecipeSerializer(ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'images', 'text',
+            'cooking_time', 'favorites_count',
         )
+        read_only_fields = ('favorites_count',)
+        list_serializer_class = ImageDerivativesListSerializer
 
     def get_author(self, obj):
         return UserSerializer(obj.author, context=self.context).data
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return (
-            not user.is_anonymous
-            and obj.favorites.filter(user=user).exists()
-        )
+        return getattr(obj, 'is_favorited', False)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return (
-            not user.is_anonymous
-            and obj.shoppinglists.filter(user=user).exists()
-        )
+        return getattr(obj, 'is_in_shopping_cart', False)
 
     def validate_tags(self, value):
         if not value:
@@ -222,15 +289,17 @@ class RecipeSerializer(ModelSerializer):
     def validate_ingredients(self, value):
         if not value:
             raise ValidationError(EMPTY_FIELDS[1])
-        unique_ids = set()
-        for item in value:
-            ingredient = item['ingredient']
-            id = ingredient['id']
-            if not Ingredient.objects.filter(id=id).exists():
-                raise ValidationError(f'Ингредиент с id={id} не существует.')
-            if id in unique_ids:
-                raise ValidationError(UNIQUE_FIELDS[2])
-            unique_ids.add(id)
+        ids = [item['ingredient']['id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise ValidationError(UNIQUE_FIELDS[2])
+        missing = set(ids).difference(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        if missing:
+            raise ValidationError(
+                'Не существуют ингредиенты с id: '
+                + ', '.join(map(str, sorted(missing))) + '.'
+            )
         return value
 
     def validate_image(self, value):
@@ -243,13 +312,12 @@ class RecipeSerializer(ModelSerializer):
         RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(
-                    id=ingredient['ingredient']['id']
-                ),
+                ingredient_id=ingredient['ingredient']['id'],
                 amount=ingredient['amount']
             ) for ingredient in ingredients_data
         ])
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients_in_recipe')
         tags_data = validated_data.pop('tags')
@@ -259,6 +327,7 @@ class RecipeSerializer(ModelSerializer):
         self.create_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients_data = validated_data.pop('ingredients_in_recipe', None)
@@ -273,7 +342,19 @@ class RecipeSerializer(ModelSerializer):
         return instance
 
     def to_representation(self, instance):
-        """Переопределение для изменения представления поля `tags`."""
+        """
+        Переопределение для изменения представления поля `tags`.
+        Связи только что сохранённого рецепта подгружаются двумя запросами,
+        уже загруженные вьюсетом повторно не запрашиваются.
+        """
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredients_in_recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
         represent = super().to_representation(instance)
         represent['tags'] = TagSerializer(instance.tags.all(), many=True).data
         return represent
@@ -283,4 +364,4 @@ class ShortLinkSerializer(ModelSerializer):
     """Сериализатор для короткой ссылки."""
     class Meta:
         model = ShortLink
-        fields = ('original_url', 'short_code')
+        fields = ('original_url', 'short_code', 'clicks', 'last_clicked_at')
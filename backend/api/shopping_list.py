@@ -0,0 +1,177 @@
+"""
+Сборка списка покупок: агрегация ингредиентов, отрисовка PDF
+и потоковая выгрузка в текст, CSV и JSON.
+PDF отрисовывается целиком: reportlab держит страницы в памяти
+до `save()` и пишет таблицу смещений в конце файла. Готовый PDF
+кэшируется по версиям корзины пользователя, рецептов в ней
+и справочника ингредиентов.
+"""
+import csv
+import hashlib
+import io
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.autocomplete import INGREDIENTS
+from api.cache import get_versions, recipe_namespace
+from constants import (
+    LINE_SPACING,
+    PAGE_BOTTOM_MARGIN,
+    PAGE_TOP,
+    PAGE_WIDTH_MARGIN,
+    TEXT_FONT_SIZE,
+    TITLE_FONT_SIZE,
+)
+from recipes.models import RecipeIngredient, ShoppingList
+
+
+FONT_NAME = 'DejaVuSans'
+FONT_PATH = settings.BASE_DIR / 'fonts' / 'DejaVuSans.ttf'
+TITLE = 'Список покупок'
+CSV_HEADER = ('name', 'measurement_unit', 'amount')
+ITERATOR_CHUNK_SIZE = 500
+
+
+def cart_namespace(user_id):
+    return f'cart:{user_id}'
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    """Зарегистрировать шрифт один раз на процесс."""
+    pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
+
+
+def get_ingredients(recipe_ids):
+    """
+    Суммарное количество каждого ингредиента рецептов списка покупок.
+    Рецепты берутся из того же списка id, по которому строится ключ
+    кэша, чтобы документ всегда соответствовал ключу.
+    """
+    return (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total_amount=Sum('amount'))
+        .order_by('ingredient__name')
+    )
+
+
+def get_row(ingredient):
+    return (
+        ingredient['ingredient__name'],
+        ingredient['ingredient__measurement_unit'],
+        ingredient['total_amount'],
+    )
+
+
+def format_line(idx, ingredient):
+    name, unit, amount = get_row(ingredient)
+    return f'{idx}. {name} — {amount} {unit}'
+
+
+def get_cart_recipes(user):
+    """Id рецептов в корзине, закэшированные под текущей версией корзины."""
+    version, = get_versions((cart_namespace(user.id),))
+    key = f'shopping_list:recipes:{user.id}:{version}'
+    recipe_ids = cache.get(key)
+    if recipe_ids is None:
+        recipe_ids = sorted(
+            ShoppingList.objects.filter(user=user)
+            .values_list('recipe_id', flat=True)
+        )
+        cache.set(key, recipe_ids, settings.RESPONSE_CACHE_TIMEOUT)
+    return recipe_ids
+
+
+def get_document_key(recipe_ids, document_format):
+    versions = get_versions(
+        (INGREDIENTS, *map(recipe_namespace, recipe_ids))
+    )
+    source = f'{recipe_ids}:{versions}'
+    return 'shopping_list:{}:{}'.format(
+        document_format, hashlib.md5(source.encode()).hexdigest()
+    )
+
+
+def render_pdf(ingredients):
+    register_font()
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.setFont(FONT_NAME, TITLE_FONT_SIZE)
+    page_width = pdf._pagesize[0]
+    title_width = pdf.stringWidth(TITLE, FONT_NAME, TITLE_FONT_SIZE)
+    pdf.drawString((page_width - title_width) / 2, PAGE_TOP, TITLE)
+
+    y = PAGE_TOP - LINE_SPACING * 2
+    pdf.setFont(FONT_NAME, TEXT_FONT_SIZE)
+    for idx, ingredient in enumerate(ingredients, start=1):
+        pdf.drawString(PAGE_WIDTH_MARGIN, y, format_line(idx, ingredient))
+        y -= LINE_SPACING
+        if y < PAGE_BOTTOM_MARGIN:
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, TEXT_FONT_SIZE)
+            y = PAGE_TOP - LINE_SPACING
+    pdf.save()
+    return buffer.getvalue()
+
+
+def get_pdf(recipe_ids):
+    """PDF списка покупок из кэша или заново отрисованный."""
+    key = get_document_key(recipe_ids, 'pdf')
+    document = cache.get(key)
+    if document is None:
+        document = render_pdf(get_ingredients(recipe_ids))
+        cache.set(key, document, settings.RESPONSE_CACHE_TIMEOUT)
+    return document
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def render_txt(ingredients):
+    yield f'{TITLE}\n\n'
+    for idx, ingredient in enumerate(ingredients, start=1):
+        yield format_line(idx, ingredient) + '\n'
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for ingredient in ingredients:
+        yield writer.writerow(get_row(ingredient))
+
+
+def render_json(ingredients):
+    separator = '['
+    for ingredient in ingredients:
+        yield separator + json.dumps(
+            dict(zip(CSV_HEADER, get_row(ingredient))), ensure_ascii=False
+        )
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+EXPORTS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json'),
+}
+
+
+def stream_export(recipe_ids, document_format):
+    """Выгрузка без reportlab, построчно из курсора агрегирующего запроса."""
+    render, content_type = EXPORTS[document_format]
+    ingredients = get_ingredients(recipe_ids).iterator(ITERATOR_CHUNK_SIZE)
+    return render(ingredients), content_type
@@ -0,0 +1,257 @@
+"""
+Двухуровневый кэш коротких ссылок: LRU в памяти процесса перед общим
+кэшем. Переход по известной ссылке и повторная выдача ссылки на рецепт
+обходятся без запросов к базе. Неизвестные коды кэшируются ненадолго
+и только в общем кэше, чтобы перебор кодов не вытеснял из LRU живые
+ссылки и не доходил до базы.
+Переходы считаются в буфере процесса и записываются пакетами
+фоновым потоком.
+"""
+import atexit
+import hashlib
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.db.models import (
+    Case,
+    DateTimeField,
+    F,
+    PositiveIntegerField,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from shortlinks.models import ShortLink
+
+
+CODE_PREFIX = 'shortlink:code:'
+URL_PREFIX = 'shortlink:url:'
+MISSING = ''
+FLUSH_CHUNK_SIZE = 500
+
+
+class LocalCache:
+    """
+    LRU ограниченного размера в памяти процесса. Записи живут не дольше
+    `timeout` секунд: изменения ссылок в других процессах видны не позже.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (value, monotonic() + self.timeout)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+local = LocalCache(
+    settings.SHORTLINK_LOCAL_CACHE_SIZE, settings.SHORTLINK_LOCAL_TIMEOUT
+)
+
+
+def code_key(code):
+    return CODE_PREFIX + code
+
+
+def url_key(url):
+    return URL_PREFIX + hashlib.md5(url.encode()).hexdigest()
+
+
+def get_keys(link):
+    return {
+        code_key(link.short_code): link.original_url,
+        url_key(link.original_url): link.short_code,
+    }
+
+
+def remember(link):
+    """Записать ссылку в оба уровня кэша в обе стороны."""
+    keys = get_keys(link)
+    for key, value in keys.items():
+        local.set(key, value)
+    cache.set_many(keys, settings.SHORTLINK_CACHE_TIMEOUT)
+
+
+def forget(link):
+    keys = list(get_keys(link))
+    local.delete(*keys)
+    cache.delete_many(keys)
+
+
+def get_original_url(code):
+    """Оригинальный URL по короткому коду или None для неизвестного кода."""
+    key = code_key(code)
+    url = local.get(key)
+    if url is not None:
+        return url
+    url = cache.get(key)
+    if url is None:
+        link = ShortLink.objects.filter(short_code=code).first()
+        if link is None:
+            cache.set(key, MISSING, settings.SHORTLINK_MISS_TIMEOUT)
+            return None
+        remember(link)
+        return link.original_url
+    if url == MISSING:
+        return None
+    local.set(key, url)
+    return url
+
+
+def get_short_code(url):
+    """Короткий код для URL; ссылка создаётся при первом обращении."""
+    key = url_key(url)
+    code = local.get(key)
+    if code is not None:
+        return code
+    code = cache.get(key)
+    if code is None:
+        link, _ = ShortLink.objects.get_or_create(original_url=url)
+        remember(link)
+        return link.short_code
+    local.set(key, code)
+    return code
+
+
+class ClickBuffer:
+    """
+    Переходы по ссылкам, накопленные в памяти процесса: код — число
+    переходов и время последнего. Буфер записывает в базу фоновый поток
+    раз в `interval` секунд и сразу, когда в буфере набирается `size`
+    разных кодов; запрос с переходом базу не трогает. Поток запускается
+    при первом переходе в процессе. При аварийном завершении процесса
+    (SIGKILL) теряются переходы не более чем за `interval` секунд.
+    """
+
+    def __init__(self, interval, size):
+        self.interval = interval
+        self.size = size
+        self.lock = Lock()
+        self.clicks = {}
+        self.wake = Event()
+        self.thread = None
+
+    def record(self, code):
+        clicked_at = timezone.now()
+        with self.lock:
+            count, _ = self.clicks.get(code, (0, None))
+            self.clicks[code] = (count + 1, clicked_at)
+            full = len(self.clicks) >= self.size
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(
+                    target=self.run, name='shortlink-clicks', daemon=True
+                )
+                self.thread.start()
+        if full:
+            self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            finally:
+                # Соединения этого потока не держатся между сбросами.
+                connections.close_all()
+
+    def take(self):
+        with self.lock:
+            clicks, self.clicks = self.clicks, {}
+        return clicks
+
+    def put_back(self, clicks):
+        with self.lock:
+            for code, (count, clicked_at) in clicks.items():
+                buffered, last = self.clicks.get(code, (0, clicked_at))
+                self.clicks[code] = (
+                    buffered + count, max(last, clicked_at)
+                )
+
+    def flush(self):
+        """
+        Записать буфер: по запросу `UPDATE ... SET clicks = clicks + n`
+        на пачку кодов. Коды упорядочены, чтобы параллельные сбросы
+        из разных процессов блокировали строки в одном порядке.
+        При ошибке базы переходы возвращаются в буфер.
+        """
+        clicks = self.take()
+        if not clicks:
+            return 0
+        codes = sorted(clicks)
+        try:
+            with transaction.atomic():
+                for start in range(0, len(codes), FLUSH_CHUNK_SIZE):
+                    update_clicks(
+                        clicks, codes[start:start + FLUSH_CHUNK_SIZE]
+                    )
+        except DatabaseError:
+            self.put_back(clicks)
+            return 0
+        return len(codes)
+
+
+def by_code(values, output_field):
+    """Выражение, выбирающее значение из `values` по коду строки."""
+    return Case(
+        *(
+            When(short_code=code, then=Value(value))
+            for code, value in values.items()
+        ),
+        output_field=output_field,
+    )
+
+
+def update_clicks(clicks, codes):
+    count = by_code(
+        {code: clicks[code][0] for code in codes}, PositiveIntegerField()
+    )
+    clicked_at = by_code(
+        {code: clicks[code][1] for code in codes}, DateTimeField()
+    )
+    ShortLink.objects.filter(short_code__in=codes).update(
+        clicks=F('clicks') + count,
+        last_clicked_at=Greatest(
+            Coalesce('last_clicked_at', clicked_at), clicked_at
+        ),
+    )
+
+
+click_buffer = ClickBuffer(
+    settings.SHORTLINK_CLICKS_FLUSH_INTERVAL,
+    settings.SHORTLINK_CLICKS_BUFFER_SIZE,
+)
+atexit.register(click_buffer.flush)
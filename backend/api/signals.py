@@ -0,0 +1,163 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_tokens
+from api.autocomplete import INGREDIENTS
+from api.cache import CATALOG, RECIPES, bump, recipe_namespace
+from api.nplusone import record_shape
+from api.shopping_list import cart_namespace
+from api.short_links import forget, remember
+from api.timing import record_query
+from recipes.images import make_derivatives
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+)
+from shortlinks.models import ShortLink
+
+
+User = get_user_model()
+
+USER_PUBLIC_FIELDS = {'email', 'username', 'first_name', 'last_name', 'avatar'}
+
+
+def bump_on_commit(*namespaces):
+    """Сменить версии после фиксации транзакции, а не посреди неё."""
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    bump_on_commit(RECIPES, recipe_namespace(instance.id))
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_derivatives(sender, instance, **kwargs):
+    """Уменьшенные копии создаются один раз, сразу после загрузки."""
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: make_derivatives(name))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorites_count(sender, instance, **kwargs):
+    """
+    Число добавлений в избранное выводится в карточке рецепта.
+    Списки рецептов не сбрасываются: иначе каждый клик по избранному
+    сбрасывал бы все закэшированные страницы. В списках для анонимов
+    счётчик может отставать на `RESPONSE_CACHE_TIMEOUT`.
+    """
+    bump_on_commit(recipe_namespace(instance.recipe_id))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredient(sender, instance, **kwargs):
+    bump_on_commit(RECIPES, recipe_namespace(instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Recipe):
+        bump_on_commit(RECIPES, recipe_namespace(instance.id))
+    else:
+        bump_on_commit(CATALOG)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_catalog(sender, **kwargs):
+    bump_on_commit(CATALOG)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_on_commit(CATALOG, INGREDIENTS)
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def invalidate_cart(sender, instance, **kwargs):
+    bump_on_commit(cart_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    """Имя и аватар автора входят в ответы с его рецептами."""
+    if created or (
+        update_fields and not USER_PUBLIC_FIELDS & set(update_fields)
+    ):
+        return
+    recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    if recipe_ids:
+        bump_on_commit(RECIPES, *map(recipe_namespace, recipe_ids))
+
+
+@receiver(pre_save, sender=ShortLink)
+def forget_changed_short_link(sender, instance, raw, **kwargs):
+    """Старые код и URL изменённой ссылки больше не должны отвечать."""
+    if raw or instance.pk is None:
+        return
+    old = ShortLink.objects.filter(pk=instance.pk).first()
+    if old is not None:
+        transaction.on_commit(lambda: forget(old))
+
+
+@receiver(post_save, sender=ShortLink)
+def remember_short_link(sender, instance, **kwargs):
+    """Запись перекрывает и закэшированный промах по этому коду."""
+    transaction.on_commit(lambda: remember(instance))
+
+
+@receiver(post_delete, sender=ShortLink)
+def forget_short_link(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget(instance))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Выход из системы и удаление токена в админке."""
+    key = instance.key
+    transaction.on_commit(lambda: forget_tokens([key]))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """Пароль, активность и профиль пользователя хранятся вместе с токеном."""
+    if created:
+        return
+    keys = list(
+        Token.objects.filter(user_id=instance.pk)
+        .values_list('key', flat=True)
+    )
+    if keys:
+        transaction.on_commit(lambda: forget_tokens(keys))
+
+
+@receiver(connection_created)
+def watch_queries(sender, connection, **kwargs):
+    """
+    SQL-запросы каждого соединения попадают в замер запроса
+    и в поиск N+1.
+    """
+    for wrapper in (record_query, record_shape):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,111 @@
+"""
+Замеры обработки запроса: общее время, число и время SQL-запросов,
+время представления DRF без SQL и рендеринга, размер ответа.
+Замер текущего запроса хранится в contextvar, поэтому SQL учитывается
+и в потоках, куда запрос передаётся вместе с контекстом (`sync_to_async`,
+пул асинхронных представлений).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from api.metrics import histograms
+
+
+current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Замер одного запроса; время в секундах."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.total = None
+        self.sql_queries = 0
+        self.sql = 0.0
+        self.phases = {}
+        self.size = None
+
+    def finish(self, response):
+        self.total = perf_counter() - self.started
+        if not response.streaming:
+            self.size = len(response.content)
+
+    def server_timing(self):
+        """Значение заголовка `Server-Timing`, время в миллисекундах."""
+        parts = [
+            f'total;dur={self.total * 1000:.2f}',
+            f'sql;dur={self.sql * 1000:.2f};desc="{self.sql_queries}"',
+        ]
+        parts += [
+            f'{phase};dur={duration * 1000:.2f}'
+            for phase, duration in self.phases.items()
+        ]
+        if self.size is not None:
+            parts.append(f'size;desc="{self.size}"')
+        return ', '.join(parts)
+
+    def observe(self, labels):
+        """Записать замер в гистограммы маршрута."""
+        histograms.observe(
+            'http_request_duration_seconds', labels, self.total
+        )
+        route_labels = {
+            name: value for name, value in labels.items() if name != 'status'
+        }
+        histograms.observe(
+            'http_request_sql_queries', route_labels, self.sql_queries
+        )
+        histograms.observe(
+            'http_request_sql_duration_seconds', route_labels, self.sql
+        )
+        for phase, duration in self.phases.items():
+            histograms.observe(
+                f'http_request_{phase}_duration_seconds',
+                route_labels,
+                duration,
+            )
+        if self.size is not None:
+            histograms.observe(
+                'http_response_size_bytes', route_labels, self.size
+            )
+
+
+@contextmanager
+def measure(phase):
+    """
+    Добавить время блока к фазе текущего запроса. SQL-запросы блока
+    учитываются отдельно и из времени фазы вычитаются.
+    """
+    timing = current.get()
+    if timing is None:
+        yield
+        return
+    started, sql = perf_counter(), timing.sql
+    try:
+        yield
+    finally:
+        timing.phases[phase] = timing.phases.get(phase, 0.0) + (
+            perf_counter() - started - (timing.sql - sql)
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL, см. `connection.execute_wrapper`."""
+    timing = current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.sql += perf_counter() - started
+        timing.sql_queries += 1
+
+
+class TimedViewMixin:
+    """Время представления DRF (без SQL) попадает в фазу `view`."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with measure('view'):
+            return super().dispatch(request, *args, **kwargs)
@@ -1,18 +1,22 @@
-from pathlib import Path
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
@@ -23,29 +27,32 @@ from rest_framework.status import (
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
 )
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api.authentication import AUTH_CACHE_HITS, AUTH_CACHE_MISSES
+from api.autocomplete import ingredient_index
+from api.cache import AnonymousCacheMixin
 from api.filters import IngredientSearchFilter, RecipeFilter
+from api.metrics import hit_rate, publisher, render_prometheus
 from api.pagination import FoodgramPagination
 from api.permissions import IsAuthorOrReadOnly
+from api.recipe_rows import RecipeRowsMixin
+from api.renderers import PrometheusRenderer
 from api.serializers import (
     AvatarSerializer,
     IngredientSerializer,
     RecipeSerializer,
+    ShortLinkSerializer,
     ShortRecipeSerializer,
     SubscribeSerializer,
     TagSerializer,
     UserRecipeSerializer,
     UserSerializer,
 )
-from constants import (
-    LINE_SPACING,
-    PAGE_BOTTOM_MARGIN,
-    PAGE_TOP,
-    PAGE_WIDTH_MARGIN,
-    TEXT_FONT_SIZE,
-    TITLE_FONT_SIZE,
-)
+from api.shopping_list import EXPORTS, get_cart_recipes, get_pdf, stream_export
+from api.short_links import click_buffer, get_original_url, get_short_code
+from api.timing import TimedViewMixin
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -61,7 +68,20 @@ from users.models import Subscription
 User = get_user_model()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+def annotate_is_subscribed(queryset, user):
+    """Добавить к queryset пользователей флаг подписки на них `user`."""
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('pk'))
+        )
+    )
+
+
+class TagViewSet(TimedViewMixin, ReadOnlyModelViewSet):
     """Вьюсет для тегов"""
 
     queryset = Tag.objects.all()
@@ -70,7 +90,7 @@ class TagViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(TimedViewMixin, ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов"""
 
     queryset = Ingredient.objects.all()
@@ -80,8 +100,15 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filterset_class = IngredientSearchFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Список и автодополнение отдаются из индекса в памяти процесса."""
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return Response(ingredient_index.all())
+
 
-class UserViewSet(UserViewSet):
+class UserViewSet(TimedViewMixin, UserViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
@@ -89,8 +116,39 @@ class UserViewSet(UserViewSet):
     lookup_field = 'id'
     filter_backends = (SearchFilter,)
     search_fields = ('username',)
+    cursor_ordering = ('username', 'id')
     http_method_names = ('get', 'post', 'put', 'delete')
 
+    def get_queryset(self):
+        """
+        Аннотирует подписку текущего пользователя на каждого автора.
+        Для подписок добавляет последние рецепты автора, их число
+        хранится в самой модели пользователя.
+        """
+        queryset = annotate_is_subscribed(
+            super().get_queryset(), self.request.user
+        )
+        if self.action not in ('subscriptions', 'subscribe'):
+            return queryset
+        return queryset.prefetch_related(self.get_latest_recipes_prefetch())
+
+    def get_latest_recipes_prefetch(self):
+        """
+        Последние `recipes_limit` рецептов каждого автора одним запросом:
+        коррелированный подзапрос с LIMIT выбирает id рецептов по автору.
+        """
+        recipes = Recipe.objects.all()
+        try:
+            limit = int(self.request.query_params.get('recipes_limit'))
+        except (ValueError, TypeError):
+            limit = None
+        if limit is not None and limit >= 0:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(author_id=OuterRef('author_id'))
+                .order_by('-pub_date', '-id').values('id')[:limit]
+            ))
+        return Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
+
     @action(
         detail=False, methods=['get', 'patch'], url_path='me',
         url_name='me', permission_classes=(IsAuthenticated,)
@@ -121,6 +179,7 @@ class UserViewSet(UserViewSet):
             )
             serializer.is_valid(raise_exception=True)
             subscription = serializer.save()
+            subscription.author = self.get_queryset().get(id=author.id)
             return Response(
                 serializer.to_representation(subscription),
                 status=HTTP_201_CREATED
@@ -141,9 +200,9 @@ class UserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         """Получить список пользователей, на которых подписан пользователь."""
-        subscriptions = User.objects.filter(author__user=request.user)
+        subscriptions = self.get_queryset().filter(author__user=request.user)
         paginator = self.pagination_class()
-        authors = paginator.paginate_queryset(subscriptions, request,)
+        authors = paginator.paginate_queryset(subscriptions, request, self)
         serializer = UserRecipeSerializer(
             authors, many=True, context={'request': request}
         )
@@ -168,19 +227,53 @@ class UserViewSet(UserViewSet):
         return Response(serializer.data)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(
+    TimedViewMixin, AnonymousCacheMixin, RecipeRowsMixin, ModelViewSet
+):
     """Вьюсет для рецептов."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     pagination_class = FoodgramPagination
+    cursor_ordering = ('-pub_date', '-id')
+    cache_query_params = (
+        'tags', 'tags_match', 'author', 'page', 'limit', 'cursor',
+        'is_favorited', 'is_in_shopping_cart', 'search',
+    )
+
+    def get_author_queryset(self):
+        return annotate_is_subscribed(User.objects.all(), self.request.user)
 
     def get_queryset(self):
-        """Оптимизация запроса."""
-        return (super().get_queryset().prefetch_related(
-            'tags', 'ingredients', 'author'))
+        """
+        Оптимизация запроса.
+        Флаги избранного и списка покупок вычисляются подзапросами `Exists`
+        в том же запросе, что и сами рецепты.
+        """
+        user = self.request.user
+        queryset = super().get_queryset().prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_in_recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            Prefetch('author', queryset=self.get_author_queryset()),
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingList.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
 
     @action(detail=True,
             methods=['post'],
@@ -246,53 +339,50 @@ class RecipeViewSet(ModelViewSet):
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        """Скачать список покупок в формате PDF."""
-        user = request.user
-        shopping_list = ShoppingList.objects.filter(user=user)
-        if not shopping_list.exists():
+        """
+        Скачать список покупок.
+        Формат задаётся параметром `format`: pdf (по умолчанию), txt,
+        csv или json.
+        """
+        document_format = request.query_params.get('format', 'pdf')
+        if document_format != 'pdf' and document_format not in EXPORTS:
+            return Response(
+                {'detail': f'Неизвестный формат: {document_format}.'},
+                status=HTTP_400_BAD_REQUEST
+            )
+        recipe_ids = get_cart_recipes(request.user)
+        if not recipe_ids:
             return Response(
                 {'detail': 'Список покупок пуст.'},
                 status=HTTP_400_BAD_REQUEST
             )
+        filename = f'list.{document_format}'
+        if document_format == 'pdf':
+            # PDF не потоковый: reportlab пишет документ только целиком,
+            # а в кэше он хранится одним значением.
+            response = HttpResponse(
+                get_pdf(recipe_ids), content_type='application/pdf'
+            )
+        else:
+            content, content_type = stream_export(
+                recipe_ids, document_format
+            )
+            response = StreamingHttpResponse(
+                content, content_type=content_type
+            )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__shoppinglists__user=user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
-            .order_by('ingredient__name')
+    def perform_content_negotiation(self, request, force=False):
+        """
+        У списка покупок параметр `format` выбирает формат файла,
+        а не рендерер DRF, поэтому неизвестный рендерер не ошибка.
+        """
+        return super().perform_content_negotiation(
+            request,
+            force=force or self.action == 'download_shopping_cart'
         )
 
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = ('attachment; filename="list.pdf"')
-        pdf = canvas.Canvas(response)
-
-        BASE_DIR = Path(__file__).resolve().parent.parent
-        FONT_PATH = BASE_DIR / 'fonts' / 'DejaVuSans.ttf'
-        pdfmetrics.registerFont(TTFont('DejaVuSans', str(FONT_PATH)))
-
-        pdf.setFont('DejaVuSans', TITLE_FONT_SIZE)
-        page_width = pdf._pagesize[0]
-        title = 'Список покупок'
-        title_width = pdf.stringWidth(title, 'DejaVuSans', TITLE_FONT_SIZE)
-        pdf.drawString((page_width - title_width) / 2, PAGE_TOP, title)
-
-        y = PAGE_TOP - LINE_SPACING * 2
-        pdf.setFont('DejaVuSans', TEXT_FONT_SIZE)
-        for idx, ingredient in enumerate(ingredients, start=1):
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['total_amount']
-            line = f'{idx}. {name} — {amount} {unit}'
-            pdf.drawString(PAGE_WIDTH_MARGIN, y, line)
-            y -= LINE_SPACING
-            if y < PAGE_BOTTOM_MARGIN:
-                pdf.showPage()
-                pdf.setFont('DejaVuSans', TEXT_FONT_SIZE)
-                y = PAGE_TOP - LINE_SPACING
-        pdf.save()
-        return response
-
     @action(detail=True,
             methods=['get'],
             url_path='get-link',
@@ -300,11 +390,63 @@ class RecipeViewSet(ModelViewSet):
             permission_classes=[IsAuthenticatedOrReadOnly])
     def get_link(self, request, pk=None):
         url = request.build_absolute_uri(f'/recipes/{pk}/')
-        short_link, created = ShortLink.objects.get_or_create(original_url=url)
         base_url = request.build_absolute_uri('/s/').rstrip('/')
-        return Response({'short-link': f'{base_url}/{short_link.short_code}'})
+        return Response({'short-link': f'{base_url}/{get_short_code(url)}'})
 
 
 def redirect_to_recipe(request, code):
     """Перенаправление по короткой ссылке на оригинальный URL."""
-    return redirect(get_object_or_404(ShortLink, short_code=code).original_url)
+    url = get_original_url(code)
+    if url is None:
+        raise Http404
+    click_buffer.record(code)
+    return redirect(url)
+
+
+class ShortLinkViewSet(TimedViewMixin, ReadOnlyModelViewSet):
+    """
+    Статистика переходов по коротким ссылкам для администраторов,
+    от самых популярных ссылок к менее популярным.
+    """
+
+    queryset = ShortLink.objects.order_by('-clicks', '-id')
+    serializer_class = ShortLinkSerializer
+    permission_classes = (IsAdminUser,)
+    pagination_class = FoodgramPagination
+    cursor_ordering = ('-clicks', '-id')
+    lookup_field = 'short_code'
+
+    def get_queryset(self):
+        """Переходы из буфера этого процесса попадают в ответ сразу."""
+        click_buffer.flush()
+        return super().get_queryset()
+
+
+class MetricsView(TimedViewMixin, APIView):
+    """
+    Счётчики и доли попаданий в кэши: при `METRICS_DIR` — сумма
+    по воркерам, иначе процесса, обслужившего запрос.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        values, _ = publisher.collect()
+        values['auth_token_cache_hit_rate'] = hit_rate(
+            values.get(AUTH_CACHE_HITS, 0), values.get(AUTH_CACHE_MISSES, 0)
+        )
+        return Response(values)
+
+
+class PrometheusMetricsView(APIView):
+    """
+    Счётчики и гистограммы маршрутов в текстовом формате Prometheus:
+    при `METRICS_DIR` — сумма по воркерам, иначе процесса,
+    обслужившего запрос.
+    """
+
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(render_prometheus(*publisher.collect()))
@@ -72,3 +72,6 @@ EMPTY_FIELDS = (
 FORBIDDEN_FILE = 'Загруженный файл не является корректным файлом изображения!'
 
 RESOLVED_TYPE = ('.png', '.jpg', '.jpeg')
+
+IMAGE_DERIVATIVES = (('thumbnail', 200), ('card', 600), ('full', 1600))
+IMAGE_QUALITY = 80
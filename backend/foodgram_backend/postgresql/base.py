@@ -0,0 +1,223 @@
+"""
+Бэкенд PostgreSQL с управлением соединениями.
+Постоянное соединение проверяется перед первым запросом к базе в каждом
+HTTP-запросе (`CONN_HEALTH_CHECKS`), при `POOL_SIZE` больше нуля
+соединения процесса берутся из пула ограниченного размера.
+Открытые, повторно использованные и неудавшиеся соединения считаются
+в счётчиках процесса.
+"""
+import os
+from threading import BoundedSemaphore, Lock
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import Error, OperationalError
+
+from api.metrics import counters
+
+
+OPENED = 'db_connections_opened'
+REUSED = 'db_connections_reused'
+FAILED = 'db_connections_failed'
+HEALTH_CHECKS_FAILED = 'db_health_checks_failed'
+POOL_TIMEOUTS = 'db_pool_timeouts'
+
+
+def is_alive(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Error:
+        return False
+    return True
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Error:
+        pass
+
+
+class ConnectionPool:
+    """
+    Пул соединений процесса не больше `size` штук. Поток, которому
+    не досталось соединения, ждёт `timeout` секунд, затем получает
+    ошибку соединения. Свободные соединения выдаются начиная
+    с последнего возвращённого: при спаде нагрузки в работе остаются
+    одни и те же соединения.
+    """
+
+    def __init__(self, size, timeout):
+        self.timeout = timeout
+        self.slots = BoundedSemaphore(size)
+        self.lock = Lock()
+        self.idle = []
+
+    def acquire(self, connect, health_checks=False):
+        if not self.slots.acquire(timeout=self.timeout):
+            counters.increment(POOL_TIMEOUTS)
+            raise OperationalError(
+                'Нет свободных соединений в пуле за '
+                f'{self.timeout} с.'
+            )
+        try:
+            while True:
+                with self.lock:
+                    connection = self.idle.pop() if self.idle else None
+                if connection is None:
+                    return connect()
+                if not connection.closed and (
+                    not health_checks or is_alive(connection)
+                ):
+                    counters.increment(REUSED)
+                    return connection
+                counters.increment(HEALTH_CHECKS_FAILED)
+                close_quietly(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection):
+        """Вернуть соединение в пул, откатив незавершённую транзакцию."""
+        try:
+            if not connection.closed:
+                connection.rollback()
+                with self.lock:
+                    self.idle.append(connection)
+        except Error:
+            close_quietly(connection)
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        close_quietly(connection)
+        self.slots.release()
+
+    def close_idle(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            close_quietly(connection)
+
+
+pools = {}
+pools_lock = Lock()
+
+
+def get_pool(alias, name, size, timeout):
+    """
+    Пул создаётся в процессе при первом обращении: соединения,
+    открытые до fork, дочерним процессам не достаются. База в ключе
+    нужна тестам: они переключают псевдоним на тестовую базу.
+    """
+    key = (alias, name, os.getpid())
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(size, timeout)
+        return pools[key]
+
+
+def close_idle_connections(name):
+    """
+    Закрыть свободные соединения пулов процесса с базой `name`:
+    базу, к которой открыты соединения, PostgreSQL удалить не даст.
+    """
+    with pools_lock:
+        idle_pools = [
+            pool for (_, pool_name, pid), pool in pools.items()
+            if pool_name == name and pid == os.getpid()
+        ]
+    for pool in idle_pools:
+        pool.close_idle()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_idle_connections(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def health_checks(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool(self):
+        size = self.settings_dict.get('POOL_SIZE') or 0
+        if size <= 0:
+            return None
+        return get_pool(
+            self.alias,
+            self.settings_dict['NAME'],
+            size,
+            self.settings_dict.get('POOL_TIMEOUT', 5),
+        )
+
+    def open_connection(self, conn_params):
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Error:
+            counters.increment(FAILED)
+            raise
+        counters.increment(OPENED)
+        return connection
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return self.open_connection(conn_params)
+        return pool.acquire(
+            lambda: self.open_connection(conn_params), self.health_checks
+        )
+
+    def connect(self):
+        # Новое или только что выданное пулом соединение уже проверено
+        # и учтено. Отметка ставится до connect(): он сам вызывает
+        # ensure_connection() из set_autocommit(), и проверка посреди
+        # открытия начала бы транзакцию до переключения autocommit.
+        self.health_check_done = True
+        super().connect()
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # Соединение, закрытое внутри atomic, Django ещё держит:
+            # в пул его возвращать нельзя.
+            if self.in_atomic_block:
+                pool.discard(self.connection)
+            else:
+                pool.release(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        # get_autocommit() внутри обращается к ensure_connection():
+        # проверка и учёт повторного использования — только перед
+        # первым запросом к базе, а не при начале и конце HTTP-запроса.
+        self.health_check_done = True
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        """
+        Соединение, оставшееся с прошлого запроса, один раз за запрос
+        проверяется перед использованием и при ошибке открывается заново.
+        """
+        if self.connection is not None and not self.health_check_done:
+            self.health_check_done = True
+            if self.in_atomic_block or not self.health_checks or (
+                self.is_usable()
+            ):
+                counters.increment(REUSED)
+            else:
+                counters.increment(HEALTH_CHECKS_FAILED)
+                self.close()
+        super().ensure_connection()
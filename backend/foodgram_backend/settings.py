@@ -37,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.server_timing_middleware',
+    'api.middleware.nplusone_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +68,24 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
+# Асинхронный путь горячих эндпоинтов, включается в asgi.py.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 8))
+
+# Заголовок раскрывает число и время SQL-запросов: по умолчанию
+# только при DEBUG.
+SERVER_TIMING_HEADER = (
+    os.getenv('SERVER_TIMING_HEADER', str(DEBUG)).lower() == 'true'
+)
+
+# Общий каталог метрик воркеров; пусто — каждый процесс отдаёт свои.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_PUBLISH_INTERVAL = int(os.getenv('METRICS_PUBLISH_INTERVAL', 5))
+
+# Поиск N+1: off, warn (в лог) или raise (исключение, для тестов).
+NPLUSONE_MODE = os.getenv('NPLUSONE_MODE', 'warn' if DEBUG else 'off')
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 3))
+
 if os.getenv('USE_SQLITE', 'false').lower() == 'true':
     DATABASES = {
         'default': {
@@ -74,17 +94,78 @@ if os.getenv('USE_SQLITE', 'false').lower() == 'true':
         }
     }
 else:
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': 'foodgram_backend.postgresql',
             'NAME': os.getenv('POSTGRES_DB', 'django'),
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
             'PORT': os.getenv('DB_PORT', 5432),
+            # С пулом соединение возвращается в него в конце запроса.
+            'CONN_MAX_AGE': int(
+                os.getenv('DB_CONN_MAX_AGE', 0 if DB_POOL_SIZE else 60)
+            ),
+            'CONN_HEALTH_CHECKS': os.getenv(
+                'DB_CONN_HEALTH_CHECKS', 'true'
+            ).lower() == 'true',
+            'POOL_SIZE': DB_POOL_SIZE,
+            'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+                'options': '-c statement_timeout={}'.format(
+                    int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+                ),
+            },
         }
     }
 
+# Локальная память по умолчанию у каждого процесса своя: сброс версий
+# из команд manage.py работающий сервер не увидит. В docker-compose
+# используется общий memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    # По умолчанию 300 записей: версионированные ключи ответов
+    # вытесняли бы версии пространств и друг друга.
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+    }
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Список и карточка рецепта из строк values() без RecipeSerializer.
+FAST_RECIPE_READS = os.getenv('FAST_RECIPE_READS', 'true').lower() == 'true'
+
+# JSON API: orjson (если установлен) или stdlib — стандартный json.
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson')
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 100))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+
+SHORTLINK_CACHE_TIMEOUT = int(os.getenv('SHORTLINK_CACHE_TIMEOUT', 86400))
+SHORTLINK_MISS_TIMEOUT = int(os.getenv('SHORTLINK_MISS_TIMEOUT', 60))
+SHORTLINK_LOCAL_CACHE_SIZE = int(
+    os.getenv('SHORTLINK_LOCAL_CACHE_SIZE', 10000)
+)
+SHORTLINK_LOCAL_TIMEOUT = int(os.getenv('SHORTLINK_LOCAL_TIMEOUT', 60))
+SHORTLINK_CLICKS_FLUSH_INTERVAL = int(
+    os.getenv('SHORTLINK_CLICKS_FLUSH_INTERVAL', 10)
+)
+SHORTLINK_CLICKS_BUFFER_SIZE = int(
+    os.getenv('SHORTLINK_CLICKS_BUFFER_SIZE', 1000)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -123,11 +204,20 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
 
     'PAGE_SIZE': PAGE_SIZE,
@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from api.views import (
     IngredientViewSet,
+    MetricsView,
+    PrometheusMetricsView,
     RecipeViewSet,
+    ShortLinkViewSet,
     TagViewSet,
     UserViewSet,
     redirect_to_recipe,
@@ -21,10 +25,26 @@ router_v1.register('users', UserViewSet, basename='users')
 router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
+router_v1.register('short-links', ShortLinkViewSet, basename='short-links')
+
+api_urls = router_v1.urls
+# get-link выдаёт ссылки без завершающего слэша: отдельный маршрут
+# избавляет переход от лишнего 301 APPEND_SLASH. У маршрутов разные
+# имена, чтобы reverse() всегда давал один и тот же адрес.
+short_link_urls = [
+    path('s/<str:code>', redirect_to_recipe, name='short-link'),
+    path('s/<str:code>/', redirect_to_recipe, name='redirect-to-recipe'),
+]
+if settings.ASYNC_VIEWS:
+    from api.async_views import with_fast_paths
+    api_urls = with_fast_paths(api_urls)
+    short_link_urls = with_fast_paths(short_link_urls)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include(router_v1.urls)),
+    path('api/', include(api_urls)),
     path('api/auth/', include('djoser.urls.authtoken')),
-    path('s/<str:code>/', redirect_to_recipe, name='redirect-to-recipe'),
+    path('api/metrics/', MetricsView.as_view(), name='api-metrics'),
+    path('metrics', PrometheusMetricsView.as_view(), name='metrics'),
+    *short_link_urls,
 ]
@@ -0,0 +1,29 @@
+"""Общие миксины моделей приложений проекта."""
+from django.db import transaction
+
+
+class CountersMixin:
+    """
+    Миксин моделей, участвующих в денормализованных счётчиках.
+    Сохранение идёт в транзакции, поэтому сигналы меняют счётчики
+    в той же транзакции, что и саму запись. Собственные счётчики модели
+    (`counter_fields`) обычное сохранение не перезаписывает: их меняют
+    только запросы UPDATE с F-выражениями.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            self.counter_fields and not self._state.adding
+            and kwargs.get('update_fields') is None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
@@ -55,13 +55,13 @@ class RecipeAdmin(ModelAdmin):
 
     def favorite_count(self, obj):
         """Вывести количество добавлений рецепта в избранное."""
-        count = Favorite.objects.filter(recipe=obj).count()
-        return format_html(f'<b>{count}</b>')
+        return format_html(f'<b>{obj.favorites_count}</b>')
 
     def get_image(self, obj):
         return mark_safe(f'<img src={obj.image.url} width="100" height="70"')
 
     favorite_count.short_description = 'Добавлений в избранное'
+    favorite_count.admin_order_field = 'favorites_count'
     get_image.short_description = 'Миниатюра'
 
     list_display = ('id', 'name', 'author', 'cooking_time',
@@ -0,0 +1,57 @@
+"""
+Денормализованные счётчики рецептов и пользователей.
+Счётчик меняется запросом UPDATE с F-выражением в той же транзакции,
+что и запись связанного объекта, и может быть пересчитан заново.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingList
+from users.models import Subscription
+
+
+User = get_user_model()
+
+# Модель со счётчиком, поле счётчика, связанная модель и её внешний ключ.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe_id'),
+    (Recipe, 'shopping_carts_count', ShoppingList, 'recipe_id'),
+    (User, 'recipes_count', Recipe, 'author_id'),
+    (User, 'subscribers_count', Subscription, 'author_id'),
+    (User, 'following_count', Subscription, 'user_id'),
+)
+
+
+def shift(model, field, pk, delta):
+    """Изменить счётчик на `delta` одним UPDATE, не опуская ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def change_counters(instance, delta):
+    """Изменить на `delta` счётчики, которые считают записи `instance`."""
+    for model, field, related, key in COUNTERS:
+        if isinstance(instance, related):
+            shift(model, field, getattr(instance, key), delta)
+
+
+def recount(model, field, related, key):
+    """
+    Пересчитать счётчик по связанным записям.
+    Возвращает число исправленных строк.
+    """
+    actual = Coalesce(Subquery(
+        related.objects.filter(**{key: OuterRef('pk')}).order_by()
+        .values(key).annotate(count=Count('pk')).values('count')
+    ), 0)
+    stale = model.objects.annotate(actual=actual).exclude(
+        **{field: F('actual')}
+    )
+    repaired = stale.count()
+    if repaired:
+        model.objects.filter(pk__in=stale.values('pk')).update(
+            **{field: actual}
+        )
+    return repaired
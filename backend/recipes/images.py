@@ -0,0 +1,148 @@
+"""
+Производные изображений рецептов: уменьшенные копии для списков и карточек.
+Имена производных вычисляются из имени оригинала, поэтому их не нужно
+хранить в базе: достаточно проверить, что файл уже создан.
+"""
+import io
+from pathlib import PurePosixPath
+from threading import Event, Lock, Thread
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from constants import IMAGE_DERIVATIVES, IMAGE_QUALITY
+
+
+if features.check('webp'):
+    IMAGE_FORMAT, EXTENSION, MODES = 'WEBP', 'webp', ('RGB', 'RGBA')
+else:
+    IMAGE_FORMAT, EXTENSION, MODES = 'JPEG', 'jpg', ('RGB',)
+
+FAILURE_TIMEOUT = 300
+
+
+def derivative_names(name):
+    path = PurePosixPath(name)
+    directory = path.parent / 'derivatives'
+    return {
+        size: str(directory / f'{path.stem}_{size}.{EXTENSION}')
+        for size, _ in IMAGE_DERIVATIVES
+    }
+
+
+def render(image, max_side):
+    copy = image.copy()
+    copy.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    copy.save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def derivatives_key(name):
+    return f'image_derivatives:{name}'
+
+
+def make_derivatives(name, storage=default_storage):
+    """
+    Создать недостающие производные изображения `name`.
+    Возвращает словарь размер -> имя файла или None, если оригинал
+    не удалось прочитать. Результат проверки запоминается в кэше.
+    """
+    key = derivatives_key(name)
+    state = cache.get(key)
+    if state is False:
+        return None
+    names = derivative_names(name)
+    if state:
+        return names
+    missing = {
+        size: path for size, path in names.items() if not storage.exists(path)
+    }
+    if missing:
+        try:
+            with storage.open(name) as file, Image.open(file) as original:
+                image = ImageOps.exif_transpose(original)
+                if image.mode not in MODES:
+                    image = image.convert(MODES[-1])
+                for size, max_side in IMAGE_DERIVATIVES:
+                    if size in missing:
+                        storage.save(missing[size], render(image, max_side))
+        except (OSError, ValueError):
+            cache.set(key, False, FAILURE_TIMEOUT)
+            return None
+    cache.set(key, True, None)
+    return names
+
+
+class DerivativesQueue:
+    """
+    Создание производных вне запроса: фоновый поток процесса по очереди
+    создаёт копии для изображений, которые ещё не проверялись. Имя,
+    уже стоящее в очереди, повторно не добавляется. Поток запускается
+    при первой постановке в очередь.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.names = {}
+        self.wake = Event()
+        self.thread = None
+
+    def put(self, names):
+        with self.lock:
+            self.names.update(dict.fromkeys(names))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(
+                    target=self.run, name='image-derivatives', daemon=True
+                )
+                self.thread.start()
+        self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            while True:
+                with self.lock:
+                    if not self.names:
+                        break
+                    name = next(iter(self.names))
+                try:
+                    make_derivatives(name)
+                finally:
+                    with self.lock:
+                        self.names.pop(name, None)
+
+
+queue = DerivativesQueue()
+
+
+def get_derivatives_many(names):
+    """
+    Производные нескольких изображений по состоянию в кэше, одним
+    обращением и без чтения хранилища: размер -> имя файла или None,
+    если копий нет или они ещё не проверены. Непроверенные изображения
+    ставятся в очередь `queue`, запрос их копий не ждёт.
+    """
+    keys = {name: derivatives_key(name) for name in names}
+    states = cache.get_many(list(keys.values()))
+    result = {}
+    unknown = []
+    for name, key in keys.items():
+        state = states.get(key)
+        if state is None:
+            unknown.append(name)
+        result[name] = derivative_names(name) if state else None
+    if unknown:
+        queue.put(unknown)
+    return result
+
+
+def delete_images(names, storage=default_storage):
+    """Удалить изображения вместе с производными и их состоянием в кэше."""
+    for name in names:
+        for path in (name, *derivative_names(name).values()):
+            storage.delete(path)
+    cache.delete_many([derivatives_key(name) for name in names])
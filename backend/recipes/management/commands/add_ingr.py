@@ -2,6 +2,8 @@ import csv
 
 from django.core.management.base import BaseCommand
 
+from api.autocomplete import INGREDIENTS
+from api.cache import bump, is_process_local
 from recipes.models import Ingredient
 
 
@@ -24,11 +26,18 @@ class Command(BaseCommand):
 
             if new_ingredients:
                 Ingredient.objects.bulk_create(new_ingredients)
+                bump(INGREDIENTS)
                 self.stdout.write(
                     self.style.SUCCESS(
                         f'Добавлено {len(new_ingredients)} новых записей.'
                     )
                 )
+                if is_process_local():
+                    self.stdout.write(self.style.WARNING(
+                        'Кэш в памяти процесса: работающий сервер увидит '
+                        'новые ингредиенты только после перезапуска. '
+                        'Для общего кэша задайте CACHE_BACKEND.'
+                    ))
             else:
                 self.stdout.write(
                     self.style.SUCCESS('Новых записей для добавления нет.')
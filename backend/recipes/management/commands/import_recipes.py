@@ -0,0 +1,280 @@
+import base64
+import binascii
+import io
+import json
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from uuid import uuid4
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from api.cache import RECIPES, bump, is_process_local
+from constants import (
+    DEFAULT_MAX_AMOUNT,
+    DEFAULT_MAX_VALUE,
+    DEFAULT_MIN_VALUE,
+    RECIPE_NAME_LEN,
+)
+from recipes.counters import shift
+from recipes.images import delete_images, make_derivatives
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import index_recipes
+
+
+User = get_user_model()
+
+IMAGE_DIR = Recipe._meta.get_field('image').upload_to
+
+
+def save_image(source, base_dir):
+    """
+    Раскодировать изображение (base64 или путь к файлу), проверить его
+    и сохранить в хранилище вместе с уменьшенными копиями.
+    Выполняется в дочернем процессе.
+    """
+    try:
+        if source.startswith('data:image'):
+            data = base64.b64decode(source.split(';base64,', 1)[1])
+        else:
+            data = (Path(base_dir) / source).read_bytes()
+        with Image.open(io.BytesIO(data)) as image:
+            extension = image.format.lower()
+            image.verify()
+    except (
+        IndexError, OSError, ValueError, binascii.Error,
+        UnidentifiedImageError,
+    ) as error:
+        return None, str(error)
+    name = default_storage.save(
+        f'{IMAGE_DIR}{uuid4()}.{extension}', ContentFile(data)
+    )
+    make_derivatives(name)
+    return name, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт рецептов из JSONL файла: автор, теги, ингредиенты '
+        'и изображение в base64 или путём к файлу на строку. '
+        'Повторный запуск пропускает рецепты с тем же автором и названием.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к JSONL файлу.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов для обработки изображений.'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+        self.base_dir = str(path.resolve().parent)
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {}
+        self.units = defaultdict(set)
+        for id, name, unit in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ):
+            self.ingredients[(name, unit)] = id
+            self.units[name].add(unit)
+        self.total = {'added': 0, 'skipped': 0}
+        with open(path, 'r', encoding='utf-8') as file, ProcessPoolExecutor(
+            options['workers'], initializer=django.setup
+        ) as pool:
+            lines = enumerate(file, start=1)
+            while True:
+                batch = list(islice(lines, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch, pool)
+                self.stdout.write(
+                    f'Строк обработано: {batch[-1][0]}, '
+                    f'добавлено: {self.total["added"]}, '
+                    f'пропущено: {self.total["skipped"]}.'
+                )
+        bump(RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён. Добавлено {self.total["added"]} рецептов.'
+        ))
+        if self.total['added'] and is_process_local():
+            self.stdout.write(self.style.WARNING(
+                'Кэш в памяти процесса: анонимы будут получать старые '
+                'списки рецептов от работающего сервера до '
+                'RESPONSE_CACHE_TIMEOUT. Для общего кэша задайте '
+                'CACHE_BACKEND.'
+            ))
+
+    def skip(self, number, reason):
+        self.total['skipped'] += 1
+        self.stderr.write(f'Строка {number}: {reason}')
+
+    def get_ingredient_id(self, item):
+        """
+        Id ингредиента по названию и единице измерения. Без единицы
+        запись принимается, только если название однозначно.
+        """
+        unit = item.get('measurement_unit')
+        if unit is None:
+            units = self.units.get(item['name'], ())
+            if len(units) != 1:
+                raise ValueError(
+                    f'ingredient {item["name"]!r}: укажите measurement_unit'
+                )
+            unit, = units
+        return self.ingredients[(item['name'], unit)]
+
+    def parse_record(self, line):
+        record = json.loads(line)
+        if not record.get('name') or len(record['name']) > RECIPE_NAME_LEN:
+            raise ValueError('name')
+        if not record.get('image'):
+            raise ValueError('image')
+        cooking_time = record['cooking_time']
+        if not DEFAULT_MIN_VALUE <= cooking_time <= DEFAULT_MAX_VALUE:
+            raise ValueError('cooking_time')
+        record['tag_ids'] = {self.tags[slug] for slug in record['tags']}
+        record['ingredient_ids'] = {
+            self.get_ingredient_id(item): item['amount']
+            for item in record['ingredients']
+        }
+        if not record['tag_ids'] or not record['ingredient_ids'] or any(
+            not DEFAULT_MIN_VALUE <= amount <= DEFAULT_MAX_AMOUNT
+            for amount in record['ingredient_ids'].values()
+        ):
+            raise ValueError('tags/ingredients')
+        if isinstance(record['author'], str):
+            record['author'] = {'username': record['author']}
+        record['username'] = record['author']['username']
+        return record
+
+    def parse(self, batch):
+        records = []
+        for number, line in batch:
+            if not line.strip():
+                continue
+            try:
+                records.append((number, self.parse_record(line)))
+            except (ValueError, KeyError, TypeError) as error:
+                self.skip(number, f'некорректная запись ({error!r}).')
+        return records
+
+    def get_authors(self, records):
+        """Id авторов по username, отсутствующие создаются."""
+        authors = {
+            record['username']: record['author'] for _, record in records
+        }
+        existing = dict(
+            User.objects.filter(username__in=authors)
+            .values_list('username', 'id')
+        )
+        User.objects.bulk_create([
+            User(
+                username=username,
+                email=author.get('email', f'{username}@import.invalid'),
+                first_name=author.get('first_name', username),
+                last_name=author.get('last_name', username),
+                password='!',
+            )
+            for username, author in authors.items()
+            if username not in existing
+        ], ignore_conflicts=True)
+        return dict(
+            User.objects.filter(username__in=authors)
+            .values_list('username', 'id')
+        )
+
+    def import_batch(self, batch, pool):
+        records = self.parse(batch)
+        if not records:
+            return
+        authors = self.get_authors(records)
+        existing = set(
+            Recipe.objects.filter(
+                author_id__in=authors.values(),
+                name__in=[record['name'] for _, record in records],
+            ).values_list('author_id', 'name')
+        )
+        fresh = []
+        for number, record in records:
+            key = (authors.get(record['username']), record['name'])
+            if key[0] is None:
+                self.skip(number, 'не удалось создать автора.')
+            elif key in existing:
+                self.total['skipped'] += 1
+            else:
+                existing.add(key)
+                fresh.append((number, record, key))
+
+        images = pool.map(
+            save_image,
+            [record['image'] for _, record, _ in fresh],
+            [self.base_dir] * len(fresh),
+            chunksize=16,
+        )
+        recipes = []
+        for (number, record, key), (image, error) in zip(fresh, images):
+            if error:
+                self.skip(number, f'ошибка изображения ({error}).')
+                continue
+            recipes.append((record, Recipe(
+                author_id=key[0],
+                name=record['name'],
+                text=record.get('text', ''),
+                cooking_time=record['cooking_time'],
+                image=image,
+            )))
+
+        try:
+            self.save_batch(recipes, authors)
+        except BaseException:
+            # Файлы сохранены до транзакции: при откате они не нужны.
+            delete_images([recipe.image.name for _, recipe in recipes])
+            raise
+        self.total['added'] += len(recipes)
+
+    def save_batch(self, recipes, authors):
+        with transaction.atomic():
+            Recipe.objects.bulk_create([recipe for _, recipe in recipes])
+            ids = dict(
+                ((author_id, name), id)
+                for id, author_id, name in Recipe.objects.filter(
+                    author_id__in=authors.values(),
+                    name__in=[recipe.name for _, recipe in recipes],
+                ).values_list('id', 'author_id', 'name')
+            )
+            through = Recipe.tags.through
+            tags, ingredients = [], []
+            for record, recipe in recipes:
+                recipe_id = ids[(recipe.author_id, recipe.name)]
+                tags += [
+                    through(recipe_id=recipe_id, tag_id=tag_id)
+                    for tag_id in record['tag_ids']
+                ]
+                ingredients += [
+                    RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for ingredient_id, amount
+                    in record['ingredient_ids'].items()
+                ]
+            through.objects.bulk_create(tags, ignore_conflicts=True)
+            RecipeIngredient.objects.bulk_create(
+                ingredients, ignore_conflicts=True
+            )
+            authored = Counter(recipe.author_id for _, recipe in recipes)
+            for author_id, count in authored.items():
+                shift(User, 'recipes_count', author_id, count)
+            index_recipes(ids.values())
@@ -0,0 +1,37 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_derivatives
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий для уже загруженных фото рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов для обработки изображений.'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Recipe.objects.exclude(image='')
+            .values_list('image', flat=True).distinct()
+        )
+        failed = 0
+        with ProcessPoolExecutor(
+            options['workers'], initializer=django.setup
+        ) as pool:
+            results = pool.map(make_derivatives, names, chunksize=16)
+            for done, (name, result) in enumerate(zip(names, results), 1):
+                if result is None:
+                    failed += 1
+                    self.stderr.write(f'Не удалось обработать {name}.')
+                if done % 100 == 0:
+                    self.stdout.write(f'Обработано {done} из {len(names)}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(names) - failed} изображений, ошибок: {failed}.'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import INDEX_CHUNK_SIZE, index_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт поисковых документов всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=INDEX_CHUNK_SIZE * 20,
+            help='Число рецептов, пересчитываемых в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ).iterator(options['batch_size'])
+        batch, done = [], 0
+        for recipe_id in recipe_ids:
+            batch.append(recipe_id)
+            if len(batch) == options['batch_size']:
+                done += self.index(batch)
+                batch = []
+        done += self.index(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано документов: {done}.'
+        ))
+
+    def index(self, recipe_ids):
+        if not recipe_ids:
+            return 0
+        with transaction.atomic():
+            index_recipes(recipe_ids)
+        self.stdout.write(f'Рецепты до id {recipe_ids[-1]} пересчитаны.')
+        return len(recipe_ids)
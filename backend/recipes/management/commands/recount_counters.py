@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт счётчиков избранного, списков покупок, рецептов, '
+        'подписчиков и подписок по связанным записям.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число расхождений, ничего не исправляя.'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for counter in COUNTERS:
+            model, field, _, _ = counter
+            with transaction.atomic():
+                repaired = recount(*counter)
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+            total += repaired
+            self.stdout.write(
+                f'{model._meta.verbose_name}.{field}: '
+                f'расхождений {repaired}.'
+            )
+        if options['dry_run']:
+            self.stdout.write(f'Найдено расхождений: {total}.')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено счётчиков: {total}.'
+            ))
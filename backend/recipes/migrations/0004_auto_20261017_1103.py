@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field, related in (
+        ('favorites_count', apps.get_model('recipes', 'Favorite')),
+        ('shopping_carts_count', apps.get_model('recipes', 'ShoppingList')),
+    ):
+        Recipe.objects.update(**{field: Coalesce(Subquery(
+            related.objects.filter(recipe_id=OuterRef('pk')).order_by()
+            .values('recipe_id').annotate(count=Count('pk')).values('count')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_auto_20250112_0833'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
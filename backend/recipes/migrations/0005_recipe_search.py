@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import migrations
+
+
+POSTGRES_CREATE = (
+    '''
+    CREATE TABLE recipes_search (
+        recipe_id bigint PRIMARY KEY
+            REFERENCES recipes_recipe (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    ''',
+    'CREATE INDEX recipes_search_document ON recipes_search '
+    'USING gin (document)',
+)
+SQLITE_CREATE = (
+    '''
+    CREATE VIRTUAL TABLE recipes_search USING fts5(
+        name, ingredients, text, tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+)
+
+# Документы существующих рецептов, как их строит recipes.search
+# на момент этой миграции.
+POSTGRES_BACKFILL = '''
+    INSERT INTO recipes_search (recipe_id, document)
+    SELECT recipe.id,
+        setweight(to_tsvector(%(config)s::regconfig, recipe.name), 'A')
+        || setweight(to_tsvector(
+            %(config)s::regconfig,
+            coalesce(string_agg(ingredient.name, ' '), '')
+        ), 'B')
+        || setweight(to_tsvector(%(config)s::regconfig, recipe.text), 'C')
+    FROM recipes_recipe recipe
+    LEFT JOIN recipes_recipeingredient item ON item.recipe_id = recipe.id
+    LEFT JOIN recipes_ingredient ingredient
+        ON ingredient.id = item.ingredient_id
+    GROUP BY recipe.id
+'''
+SQLITE_FOLD = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+SQLITE_INGREDIENTS = "coalesce(group_concat(ingredient.name, ' '), '')"
+SQLITE_BACKFILL = f'''
+    INSERT INTO recipes_search (rowid, name, ingredients, text)
+    SELECT recipe.id, {SQLITE_FOLD.format('recipe.name')},
+        {SQLITE_FOLD.format(SQLITE_INGREDIENTS)},
+        {SQLITE_FOLD.format('recipe.text')}
+    FROM recipes_recipe recipe
+    LEFT JOIN recipes_recipeingredient item ON item.recipe_id = recipe.id
+    LEFT JOIN recipes_ingredient ingredient
+        ON ingredient.id = item.ingredient_id
+    GROUP BY recipe.id
+'''
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+        schema_editor.execute(
+            POSTGRES_BACKFILL, {'config': settings.SEARCH_CONFIG}
+        )
+    elif vendor == 'sqlite':
+        for statement in SQLITE_CREATE:
+            schema_editor.execute(statement)
+        schema_editor.execute(SQLITE_BACKFILL)
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE IF EXISTS recipes_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_auto_20261017_1103'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
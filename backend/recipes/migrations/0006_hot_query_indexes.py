@@ -0,0 +1,62 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:23
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexWithoutLocking(AddIndexConcurrently):
+    """
+    На PostgreSQL индекс строится через CREATE INDEX CONCURRENTLY
+    и не блокирует запись в таблицу, на остальных базах — как обычно.
+    """
+
+    def database_forwards(self, app_label, schema_editor, *states):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, *states
+            )
+        return AddIndex.database_forwards(
+            self, app_label, schema_editor, *states
+        )
+
+    def database_backwards(self, app_label, schema_editor, *states):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, *states
+            )
+        return AddIndex.database_backwards(
+            self, app_label, schema_editor, *states
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0005_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favorite',
+            options={'default_related_name': 'favorites', 'ordering': ('-id',), 'verbose_name': 'Избранное', 'verbose_name_plural': 'Избранное'},
+        ),
+        migrations.AlterModelOptions(
+            name='recipeingredient',
+            options={'default_related_name': 'ingredients_in_recipe', 'ordering': ('id',), 'verbose_name': 'Ингредиент в рецепте', 'verbose_name_plural': 'Ингредиенты в рецепте'},
+        ),
+        migrations.AlterModelOptions(
+            name='shoppinglist',
+            options={'default_related_name': 'shoppinglists', 'ordering': ('-id',), 'verbose_name': 'Список покупок', 'verbose_name_plural': 'Списки покупок'},
+        ),
+        AddIndexWithoutLocking(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+        AddIndexWithoutLocking(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+    ]
@@ -14,6 +14,7 @@ from constants import (
     MIN_TIME_MSG,
     RECIPE_NAME_LEN,
 )
+from mixins import CountersMixin
 
 
 User = get_user_model()
@@ -74,7 +75,7 @@ class Ingredient(models.Model):
         return f'Ингредиент: {self.name}, ед. изм.: {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Модель для работы с рецептами."""
 
     name = models.CharField(
@@ -126,12 +127,33 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное',
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок',
+    )
+
+    counter_fields = ('favorites_count', 'shopping_carts_count')
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name[:LENGTH_TEXT]
@@ -165,7 +187,7 @@ class RecipeIngredient(models.Model):
     )
 
     class Meta:
-        ordering = ('recipe',)
+        ordering = ('id',)
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецепте'
         default_related_name = 'ingredients_in_recipe'
@@ -179,7 +201,7 @@ class RecipeIngredient(models.Model):
         return f'{self.recipe.name}: {self.ingredient.name} — {self.amount}'
 
 
-class BaseUserRecipeModel(models.Model):
+class BaseUserRecipeModel(CountersMixin, models.Model):
     """
     Вспомогательная абстрактная модель для связывания модели Recipe и User.
     Модель является базовой моделью для меделей Fovorite и ShoppingList.
@@ -197,7 +219,7 @@ class BaseUserRecipeModel(models.Model):
     )
 
     class Meta:
-        ordering = ('recipe',)
+        ordering = ('-id',)
         abstract = True
         constraints = [models.UniqueConstraint(
             fields=['user', 'recipe'],
@@ -0,0 +1,173 @@
+"""
+Полнотекстовый поиск рецептов по названию, ингредиентам и описанию.
+Документы рецептов хранятся в таблице `recipes_search`: на PostgreSQL —
+колонка `tsvector` под GIN-индексом, на SQLite — виртуальная таблица FTS5.
+Документ пересчитывается после фиксации транзакции, изменившей рецепт
+или его ингредиенты.
+"""
+import re
+from threading import local
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+
+TABLE = 'recipes_search'
+INDEX_CHUNK_SIZE = 500
+WORD = re.compile(r'\w+')
+
+pending = local()
+
+
+class PostgresSearch:
+    """
+    Поиск по `tsvector` с весами: название, ингредиенты, описание.
+    Подходящие рецепты отбирает один подзапрос по GIN-индексу, ранг
+    считается только для них, по первичному ключу документа.
+    """
+
+    index_sql = f'''
+        INSERT INTO {TABLE} (recipe_id, document)
+        SELECT recipe.id,
+            setweight(to_tsvector(%(config)s::regconfig, recipe.name), 'A')
+            || setweight(to_tsvector(
+                %(config)s::regconfig,
+                coalesce(string_agg(ingredient.name, ' '), '')
+            ), 'B')
+            || setweight(to_tsvector(%(config)s::regconfig, recipe.text), 'C')
+        FROM recipes_recipe recipe
+        LEFT JOIN recipes_recipeingredient item
+            ON item.recipe_id = recipe.id
+        LEFT JOIN recipes_ingredient ingredient
+            ON ingredient.id = item.ingredient_id
+        WHERE recipe.id = ANY(%(ids)s)
+        GROUP BY recipe.id
+        ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document
+    '''
+    query_sql = 'websearch_to_tsquery(%s::regconfig, %s)'
+
+    def index(self, cursor, recipe_ids):
+        # Документы удалённых рецептов удаляет внешний ключ с каскадом.
+        cursor.execute(self.index_sql, {
+            'config': settings.SEARCH_CONFIG, 'ids': list(recipe_ids),
+        })
+
+    def search(self, queryset, query):
+        params = (settings.SEARCH_CONFIG, query)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT recipe_id FROM {TABLE} '
+            f'WHERE document @@ {self.query_sql}',
+            params,
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ts_rank(document, {self.query_sql}) FROM {TABLE} '
+            f'WHERE recipe_id = recipes_recipe.id',
+            params,
+            output_field=FloatField(),
+        ))
+
+
+class SqliteSearch:
+    """
+    Поиск FTS5 с ранжированием bm25. Морфологии у токенизатора нет,
+    поэтому каждое слово запроса ищется как префикс; «ё» приводится к «е».
+    """
+
+    weights = (10.0, 5.0, 1.0)
+
+    @staticmethod
+    def fold_sql(column):
+        return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+    @staticmethod
+    def fold(text):
+        return text.replace('ё', 'е').replace('Ё', 'Е')
+
+    def index(self, cursor, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+        ingredients = "coalesce(group_concat(ingredient.name, ' '), '')"
+        cursor.execute(
+            f'''
+            INSERT INTO {TABLE} (rowid, name, ingredients, text)
+            SELECT recipe.id, {self.fold_sql('recipe.name')},
+                {self.fold_sql(ingredients)}, {self.fold_sql('recipe.text')}
+            FROM recipes_recipe recipe
+            LEFT JOIN recipes_recipeingredient item
+                ON item.recipe_id = recipe.id
+            LEFT JOIN recipes_ingredient ingredient
+                ON ingredient.id = item.ingredient_id
+            WHERE recipe.id IN ({placeholders})
+            GROUP BY recipe.id
+            ''',
+            recipe_ids,
+        )
+
+    def search(self, queryset, query):
+        words = WORD.findall(self.fold(query))
+        if not words:
+            return queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            ).none()
+        match = ' '.join(f'"{word}"*' for word in words)
+        weights = ', '.join(map(str, self.weights))
+        # bm25 считается только в запросе с MATCH.
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', (match,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({TABLE}, {weights}) FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s AND rowid = recipes_recipe.id',
+            (match,),
+            output_field=FloatField(),
+        ))
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch(),
+    'sqlite': SqliteSearch(),
+}
+
+
+def index_recipes(recipe_ids):
+    """Пересчитать документы рецептов; отсутствующие рецепты — удалить."""
+    recipe_ids = sorted(set(recipe_ids))
+    backend = BACKENDS[connection.vendor]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), INDEX_CHUNK_SIZE):
+            backend.index(
+                cursor, recipe_ids[start:start + INDEX_CHUNK_SIZE]
+            )
+
+
+def flush_index():
+    recipe_ids = getattr(pending, 'recipe_ids', None)
+    if recipe_ids:
+        pending.recipe_ids = set()
+        index_recipes(recipe_ids)
+
+
+def schedule_index(*recipe_ids):
+    """
+    Отложить пересчёт документов до фиксации текущей транзакции:
+    к этому моменту ингредиенты рецепта уже записаны, а несколько
+    изменений одного рецепта дают один пересчёт.
+    """
+    if not hasattr(pending, 'recipe_ids'):
+        pending.recipe_ids = set()
+    pending.recipe_ids.update(recipe_ids)
+    transaction.on_commit(flush_index)
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты, подходящие под запрос, с релевантностью `search_rank`,
+    от более релевантных к менее, при равной — от новых к старым.
+    """
+    return BACKENDS[connection.vendor].search(queryset, query).order_by(
+        '-search_rank', '-pub_date', '-id'
+    )
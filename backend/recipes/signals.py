@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counters
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+)
+from recipes.search import schedule_index
+from users.models import Subscription
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Subscription)
+@receiver(post_save, sender=Recipe)
+def increment_counters(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=Recipe)
+def decrement_counters(sender, instance, **kwargs):
+    change_counters(instance, -1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+    schedule_index(instance.id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reindex_recipe_ingredient(sender, instance, **kwargs):
+    schedule_index(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient(sender, instance, created, **kwargs):
+    """Название ингредиента входит в документы рецептов с ним."""
+    if not created:
+        schedule_index(*instance.ingredients_in_recipe.values_list(
+            'recipe_id', flat=True
+        ))
@@ -2,6 +2,7 @@ from django.contrib.admin import ModelAdmin, site
 from django.contrib.admin.decorators import register
 from django.utils.html import format_html
 
+from api.short_links import click_buffer
 from constants import ADMIN_PER_PAGE
 from recipes.models import Recipe
 from shortlinks.models import ShortLink
@@ -11,19 +12,42 @@ from shortlinks.models import ShortLink
 class ShortenerAdmin(ModelAdmin):
     """Админка Коротких ссылок."""
 
-    list_display = ('id', 'original_url', 'short_code', 'recipe_name',
-                    'recipe_image')
+    list_display = ('id', 'original_url', 'short_code', 'clicks',
+                    'last_clicked_at', 'recipe_name', 'recipe_image')
     list_per_page = ADMIN_PER_PAGE
     search_fields = ('original_url', 'recipe_name')
+    readonly_fields = ('clicks', 'last_clicked_at')
 
-    def get_recipe(self, obj):
-        """Получение объекта рецепта из original_url."""
+    def changelist_view(self, request, extra_context=None):
+        """Переходы из буфера этого процесса попадают в список сразу."""
+        click_buffer.flush()
+        return super().changelist_view(request, extra_context)
+
+    @staticmethod
+    def get_recipe_id(obj):
+        """Id рецепта из original_url."""
         try:
-            recipe_id = int(obj.original_url.rstrip('/').split('/')[-1])
-            return Recipe.objects.get(id=recipe_id)
-        except (ValueError, Recipe.DoesNotExist):
+            return int(obj.original_url.rstrip('/').split('/')[-1])
+        except ValueError:
             return None
 
+    def get_changelist_instance(self, request):
+        """Рецепты ссылок страницы загружаются одним запросом."""
+        changelist = super().get_changelist_instance(request)
+        links = changelist.result_list
+        recipes = Recipe.objects.in_bulk(
+            {self.get_recipe_id(link) for link in links} - {None}
+        )
+        for link in links:
+            link.recipe = recipes.get(self.get_recipe_id(link))
+        return changelist
+
+    def get_recipe(self, obj):
+        """Получение объекта рецепта из original_url."""
+        if hasattr(obj, 'recipe'):
+            return obj.recipe
+        return Recipe.objects.filter(id=self.get_recipe_id(obj)).first()
+
     def recipe_name(self, obj):
         """Отображение названия рецепта."""
         recipe = self.get_recipe(obj)
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortlinks', '0002_alter_shortlink_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortlink',
+            name='clicks',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходов'),
+        ),
+        migrations.AddField(
+            model_name='shortlink',
+            name='last_clicked_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последний переход'),
+        ),
+    ]
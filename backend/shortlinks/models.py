@@ -1,6 +1,12 @@
 import hashlib
 
-from django.db.models import CharField, Model, URLField
+from django.db.models import (
+    CharField,
+    DateTimeField,
+    Model,
+    PositiveIntegerField,
+    URLField,
+)
 
 from constants import CODE_LEN, MAX_URL_FIELD
 
@@ -18,6 +24,17 @@ class ShortLink(Model):
         unique=True,
         verbose_name='Короткий код'
     )
+    clicks = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Переходов'
+    )
+    last_clicked_at = DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Последний переход'
+    )
 
     def generate_short_code(self):
         """Генерация короткого кода на основе оригинального URL."""
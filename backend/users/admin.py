@@ -27,7 +27,8 @@ class UsersAdmin(ModelAdmin):
 
     list_display = (
         'id', 'username', 'email', 'role', 'first_name',
-        'last_name', 'avatar', 'get_image'
+        'last_name', 'avatar', 'get_image', 'recipes_count',
+        'subscribers_count', 'following_count',
     )
     list_display_links = ('id', 'username', 'email')
     list_editable = ('role', 'avatar')
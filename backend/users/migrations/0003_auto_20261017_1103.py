@@ -0,0 +1,47 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    for field, related, key in (
+        ('recipes_count', Recipe, 'author_id'),
+        ('subscribers_count', Subscription, 'author_id'),
+        ('following_count', Subscription, 'user_id'),
+    ):
+        User.objects.update(**{field: Coalesce(Subquery(
+            related.objects.filter(**{key: OuterRef('pk')}).order_by()
+            .values(key).annotate(count=Count('pk')).values('count')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20250112_0833'),
+        ('recipes', '0004_auto_20261017_1103'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписок'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -8,13 +8,15 @@ from constants import (
     MAX_NAME_FIELD,
     UNIQUE_FIELDS,
 )
+from mixins import CountersMixin
 from users.validators import UsernameValidator, validate_username
 
 
-class User(AbstractUser):
+class User(CountersMixin, AbstractUser):
     """
     Расширенная Django модель User -
-    добавлены поля для аватарки и роли пользователя.
+    добавлены поля для аватарки, роли пользователя
+    и счётчики рецептов, подписчиков и подписок.
     """
 
     class Role(models.TextChoices):
@@ -66,7 +68,23 @@ class User(AbstractUser):
         verbose_name='Аватарка или фото',
         help_text='Загрузите аватарку или фото',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписок',
+    )
 
+    counter_fields = ('recipes_count', 'subscribers_count', 'following_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
 
@@ -87,7 +105,7 @@ class User(AbstractUser):
         return self.username[:LENGTH_TEXT]
 
 
-class Subscription(models.Model):
+class Subscription(CountersMixin, models.Model):
     """
     Модель подписок пользователей на других пользователей.
     """
@@ -106,7 +124,7 @@ class Subscription(models.Model):
     )
 
     class Meta:
-        ordering = ('user',)
+        ordering = ('-id',)
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         constraints = [models.UniqueConstraint(